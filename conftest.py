@@ -12,6 +12,9 @@ from parso import cache
 from parso.utils import parse_version_string
 
 collect_ignore = ["setup.py"]
+if sys.version_info < (3, 5):
+    # async/await syntax
+    collect_ignore += ["parso/aio.py", "test/test_aio.py"]
 
 VERSIONS_2 = '2.6', '2.7'
 VERSIONS_3 = '3.3', '3.4', '3.5', '3.6', '3.7', '3.8'
@@ -101,3 +101,12 @@ except ImportError:
                 opfunc.__doc__ = getattr(int, opname).__doc__
                 setattr(cls, opname, opfunc)
         return cls
+
+
+try:
+    from sys import intern
+except ImportError:
+    # Python 2 has a builtin that only works with byte strings. The values of
+    # leaves are unicode, therefore just don't intern them.
+    def intern(string):
+        return string
@@ -0,0 +1,91 @@
+"""
+Parsing from :py:mod:`asyncio` code without blocking the event loop. This
+module needs Python 3.5+ and is therefore not imported by :py:mod:`parso`.
+
+Reading files, the cache lookups and the parsing itself happen in an executor
+(the default executor of the loop if none is given). Concurrent requests for
+the same code and options are only parsed once.
+
+>>> import asyncio
+>>> from parso.aio import load_grammar
+>>> async def main():
+...     grammar = await load_grammar()
+...     return await grammar.parse('foo + 1')
+>>> loop = asyncio.new_event_loop()
+>>> loop.run_until_complete(main())
+<Module: @1-1>
+>>> loop.close()
+"""
+import asyncio
+from functools import partial
+
+import parso
+from parso.file_io import FileIO
+
+
+class AsyncGrammar(object):
+    """
+    Wraps a :py:class:`parso.Grammar`. An instance should only be used within
+    one event loop.
+
+    :param grammar: A :py:class:`parso.Grammar`.
+    :param executor: A :py:class:`concurrent.futures.Executor`. If not given,
+        the default executor of the event loop is used. Process pools don't
+        work, because the cached modules live in this process.
+    """
+    def __init__(self, grammar, executor=None):
+        self.grammar = grammar
+        self._executor = executor
+        self._pending = {}
+
+    def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def parse(self, code=None, **kwargs):
+        """
+        The same as :py:meth:`parso.Grammar.parse`, but a coroutine. If
+        another parse with the same code (or the same path and file content)
+        and the same arguments is still running, its result is returned
+        instead of parsing again.
+        """
+        if code is None:
+            path = kwargs.get('path')
+            if path is None:
+                raise TypeError("Please provide either code or a path.")
+            code = await self._run(FileIO(path).read)
+
+        key = code, tuple(sorted(kwargs.items()))
+        try:
+            future = self._pending[key]
+        except KeyError:
+            future = self._run(self.grammar.parse, code, **kwargs)
+            self._pending[key] = future
+            future.add_done_callback(partial(self._remove_pending, key))
+        # If one of the callers is cancelled, the others still want the
+        # result.
+        return await asyncio.shield(future)
+
+    def _remove_pending(self, key, future):
+        if self._pending.get(key) is future:
+            del self._pending[key]
+
+    async def iter_errors(self, node):
+        """
+        Like :py:meth:`parso.Grammar.iter_errors`, but returns a list.
+        """
+        return await self._run(lambda: list(self.grammar.iter_errors(node)))
+
+
+async def load_grammar(executor=None, **kwargs):
+    """
+    Loads a grammar like :py:func:`parso.load_grammar` (in the executor,
+    because the first load of a grammar reads and generates it) and returns
+    an :py:class:`AsyncGrammar`.
+    """
+    loop = asyncio.get_event_loop()
+    grammar = await loop.run_in_executor(
+        executor,
+        partial(parso.load_grammar, **kwargs)
+    )
+    return AsyncGrammar(grammar, executor=executor)
@@ -7,6 +7,8 @@ import shutil
 import platform
 import errno
 import logging
+import threading
+import weakref
 
 try:
     import cPickle as pickle
@@ -18,7 +20,7 @@ from parso._compatibility import FileNotFoundError
 LOG = logging.getLogger(__name__)
 
 
-_PICKLE_VERSION = 32
+_PICKLE_VERSION = 39
 """
 Version number (integer) for file system cache.
 
@@ -68,14 +70,55 @@ On Linux, if environment variable ``$XDG_CACHE_HOME`` is set,
 
 parser_cache = {}
 
+_cache_lock = threading.Lock()
+# The locks are only kept while a thread uses them, otherwise there would be
+# a lock for every path that was ever parsed.
+_diff_cache_locks = weakref.WeakValueDictionary()
+
+
+def get_diff_cache_lock(hashed_grammar, path):
+    """
+    Returns the lock that has to be held while a cached module of a path is
+    changed by the diff parser. This makes sure that two threads don't change
+    the same module at the same time.
+    """
+    key = hashed_grammar, path
+    with _cache_lock:
+        lock = _diff_cache_locks.get(key)
+        if lock is None:
+            lock = _diff_cache_locks[key] = threading.RLock()
+        return lock
+
+
+def _set_cache_item(hashed_grammar, path, item):
+    with _cache_lock:
+        parser_cache.setdefault(hashed_grammar, {})[path] = item
+
 
 class _NodeCacheItem(object):
-    def __init__(self, node, lines, change_time=None):
+    def __init__(self, node, lines, change_time=None, document_version=None):
         self.node = node
         self.lines = lines
         if change_time is None:
             change_time = time.time()
         self.change_time = change_time
+        # The version id that the caller gave the code (see
+        # ``Grammar.parse``) and the items of the versions before it, the
+        # newest first. Only the item in the cache has older items.
+        self.document_version = document_version
+        self.old_items = []
+
+    def __getstate__(self):
+        # Older versions are only kept in memory.
+        state = self.__dict__.copy()
+        state['old_items'] = []
+        return state
+
+    def get_version(self, document_version):
+        for item in [self] + self.old_items:
+            if item.document_version == document_version:
+                return item
+        return None
 
 
 def load_module(hashed_grammar, file_io, cache_path=None):
@@ -122,12 +165,18 @@ def _load_from_file_system(hashed_grammar, path, p_time, cache_path=None):
     except FileNotFoundError:
         return None
     else:
-        parser_cache.setdefault(hashed_grammar, {})[path] = module_cache_item
+        _set_cache_item(hashed_grammar, path, module_cache_item)
         LOG.debug('pickle loaded: %s', path)
         return module_cache_item.node
 
 
-def save_module(hashed_grammar, file_io, module, lines, pickling=True, cache_path=None):
+def save_module(hashed_grammar, file_io, module, lines, pickling=True, cache_path=None,
+                document_version=None, keep_versions=0):
+    """
+    Caches a module. With ``keep_versions``, the items of the previous
+    versions of the path (at most ``keep_versions``) are kept in the new
+    item. The modules of these versions must not be changed anymore.
+    """
     path = file_io.path
     try:
         p_time = None if path is None else file_io.get_last_modified()
@@ -135,22 +184,55 @@ def save_module(hashed_grammar, file_io, module, lines, pickling=True, cache_pat
         p_time = None
         pickling = False
 
-    item = _NodeCacheItem(module, lines, p_time)
-    parser_cache.setdefault(hashed_grammar, {})[path] = item
+    item = _NodeCacheItem(module, lines, p_time, document_version)
+    if keep_versions:
+        item.old_items = _pop_old_items(hashed_grammar, path, keep_versions)
+    _set_cache_item(hashed_grammar, path, item)
     if pickling and path is not None:
         _save_to_file_system(hashed_grammar, path, item, cache_path=cache_path)
 
 
+def _pop_old_items(hashed_grammar, path, keep_versions):
+    try:
+        item = parser_cache[hashed_grammar][path]
+    except KeyError:
+        return []
+    old_items = [item] + item.old_items
+    # Otherwise the kept items would still reference the versions that are
+    # dropped here and these would never be freed.
+    item.old_items = []
+    return old_items[:keep_versions]
+
+
 def _save_to_file_system(hashed_grammar, path, item, cache_path=None):
-    with open(_get_hashed_path(hashed_grammar, path, cache_path=cache_path), 'wb') as f:
+    hashed_path = _get_hashed_path(hashed_grammar, path, cache_path=cache_path)
+    # Write to a temporary file first, so other threads/processes never read
+    # a half written pickle.
+    tmp_path = '%s.%s-%s.tmp' % (hashed_path, os.getpid(),
+                                 threading.current_thread().ident)
+    with open(tmp_path, 'wb') as f:
         pickle.dump(item, f, pickle.HIGHEST_PROTOCOL)
+    _replace(tmp_path, hashed_path)
+
+
+def _replace(source, destination):
+    try:
+        replace = os.replace
+    except AttributeError:
+        # Python 2, os.rename is atomic on POSIX, but doesn't overwrite
+        # files on Windows.
+        if os.path.exists(destination) and platform.system().lower() == 'windows':
+            os.remove(destination)
+        replace = os.rename
+    replace(source, destination)
 
 
 def clear_cache(cache_path=None):
     if cache_path is None:
         cache_path = _default_cache_path
     shutil.rmtree(cache_path)
-    parser_cache.clear()
+    with _cache_lock:
+        parser_cache.clear()
 
 
 def _get_hashed_path(hashed_grammar, path, cache_path=None):
@@ -1,20 +1,78 @@
 import hashlib
 import os
+import threading
+from functools import partial
+from timeit import default_timer
 
 from parso._compatibility import FileNotFoundError, is_pypy
 from parso.pgen2 import generate_grammar
 from parso.utils import split_lines, python_bytes_to_unicode, parse_version_string
 from parso.python.diff import DiffParser
+from parso.line_diff import get_edit_opcodes
 from parso.python.tokenize import tokenize_lines, tokenize
 from parso.python.token import PythonTokenTypes
-from parso.cache import parser_cache, load_module, save_module
+from parso.cache import parser_cache, load_module, save_module, \
+    get_diff_cache_lock
 from parso.parser import BaseParser
 from parso.python.parser import Parser as PythonParser
+from parso.python import tree
 from parso.python.errors import ErrorFinderConfig
 from parso.python import pep8
 from parso.file_io import FileIO, KnownContentFileIO
 
 _loaded_grammars = {}
+_loaded_grammars_lock = threading.Lock()
+
+
+class _ParserPool(threading.local):
+    """
+    The parsers that are currently not used, per thread. Parsers are not
+    thread-safe, but they can be reused after :py:meth:`BaseParser.reset`.
+    """
+    def __init__(self):
+        self.parsers = {}
+
+
+def _edit_lines(lines, edits):
+    """
+    Returns the changed lines and the changed line ranges for
+    :py:func:`parso.line_diff.get_edit_opcodes`.
+    """
+    lines = list(lines)
+    line_edits = []
+    for start_pos, end_pos, new_text in edits:
+        start_line, start_column = start_pos
+        end_line, end_column = end_pos
+        if not 1 <= start_line <= end_line <= len(lines) \
+                or start_pos > end_pos \
+                or not 0 <= start_column <= _get_line_length(lines[start_line - 1]) \
+                or not 0 <= end_column <= _get_line_length(lines[end_line - 1]):
+            raise ValueError("Invalid edit range %s-%s." % (start_pos, end_pos))
+
+        start = start_line - 1
+        end = end_line
+        code = lines[start][:start_column] + new_text + lines[end - 1][end_column:]
+        # A '\r' and a '\n' after it are one newline, even if they are in
+        # different lines now. These lines are split again together.
+        if start and lines[start - 1].endswith('\r'):
+            start -= 1
+            code = lines[start] + code
+        if end < len(lines) and code.endswith('\r'):
+            code += lines[end]
+            end += 1
+        new_lines = split_lines(code, keepends=True)
+        if end < len(lines):
+            # The code still ends with the newline of the end line, the empty
+            # string after it is the start of the next line.
+            new_lines.pop()
+        lines[start:end] = new_lines
+        line_edits.append((start, end, len(new_lines)))
+    return lines, line_edits
+
+
+def _get_line_length(line):
+    # Without the newline.
+    return len(line.rstrip('\r\n'))
 
 
 class Grammar(object):
@@ -37,6 +95,7 @@ class Grammar(object):
         self._tokenizer = tokenizer
         self._diff_parser = diff_parser
         self._hashed = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        self._parser_pool = _ParserPool()
 
     def parse(self, code=None, **kwargs):
         """
@@ -61,25 +120,152 @@ class Grammar(object):
             on your file system (e.g. for Linux in ``~/.cache/parso/``).
         :param bool diff_cache: Diffs the cached python module against the new
             code and tries to parse only the parts that have changed. Returns
-            the same (changed) module that is found in cache. Using this option
+            the same (changed) module that is found in cache. If most of the
+            code changed, it is parsed again completely, because that is
+            faster (the cached module is still reused). Using this option
             requires you to not do anything anymore with the cached modules
-            under that path, because the contents of it might change. This
-            option is still somewhat experimental. If you want stability,
-            please don't use it.
+            under that path, because the contents of it might change (unless
+            ``copy_on_update`` is used). This option is still somewhat
+            experimental. If you want stability, please don't use it.
+        :param bool copy_on_update: With ``diff_cache``, the cached module is
+            not changed. A copy of it is updated and cached instead, so the
+            modules that were returned before stay valid (e.g. for other
+            threads or to compare versions). The whole module is copied for
+            every update, even if only a line changed, so an update takes time
+            and memory in proportion to the size of the file (about a sixth
+            of parsing it, but a lot more than only updating the module).
+        :param document_version: With ``diff_cache``, an id of the version of
+            the code, e.g. the version of a document in the language server
+            protocol. If the code of this version is cached (see
+            ``keep_versions``), its module is returned without parsing.
+        :param int keep_versions: With ``diff_cache``, keeps the modules of
+            that many versions before this one in the cache (this implies
+            ``copy_on_update``), so they can be found with their
+            ``document_version``. Every kept version is a full copy of the
+            tree, only the values of the leaves are shared with the older
+            versions.
         :param bool cache_path: If given saves the parso cache in this
             directory. If not given, defaults to the default cache places on
             each platform.
+        :param str bodies: Either ``'parse'`` (default) or ``'skip'``. When
+            skipping, the bodies of functions and classes are not parsed, but
+            kept as :py:class:`parso.python.tree.LazySuite` nodes that are
+            only parsed once their children are accessed. This is a lot
+            faster if you only need an outline of a module. Cannot be
+            combined with ``cache`` and ``diff_cache``.
+        :param bool compact: Creates a tree that needs a bit less memory
+            (about 15%), which is useful if a lot of trees are kept around.
+            The values of names and numbers and the prefixes of leaves are
+            interned (shared between all trees, in Python 2 only within a
+            tree) and lists of children are not overallocated. The leaves are
+            still normal leaves with their own positions, they don't
+            reference the code. Cannot be combined with ``diff_cache``.
+        :param diff_stats: A :py:class:`parso.python.diff.DiffStats`. With
+            ``diff_cache``, the statistics of the diff parser (or of the full
+            parse if there was no cached module) are added to it.
 
         :return: A subclass of :py:class:`parso.tree.NodeOrLeaf`. Typically a
             :py:class:`parso.python.tree.Module`.
+
+        It is safe to call this method from multiple threads at the same
+        time. With ``diff_cache``, only one thread at a time updates the
+        module of a path, but the returned module is still shared and changed
+        by later calls for the same path (unless they use
+        ``copy_on_update``).
         """
         if 'start_pos' in kwargs:
             raise TypeError("parse() got an unexpected keyword argument.")
         return self._parse(code=code, **kwargs)
 
+    def apply_edits(self, path, edits, diff_stats=None, copy_on_update=False,
+                    document_version=None, keep_versions=0):
+        """
+        Changes the cached module of ``path`` (that was parsed with
+        ``diff_cache=True``) with edits, like the ones of the ``didChange``
+        notification of the language server protocol. This is the same as
+        passing the changed code to :py:meth:`parse` with ``diff_cache=True``,
+        but the code doesn't have to be split into lines and diffed again, the
+        edits already say which lines changed.
+
+        :param str path: The path of the cached module.
+        :param edits: A list of ``(start_pos, end_pos, new_text)`` tuples. The
+            code between the positions is replaced by ``new_text``. Positions
+            are ``(line, column)`` tuples like everywhere in parso (lines start
+            at 1, columns at 0). Like in the language server protocol, the
+            positions of an edit refer to the code after the previous edits.
+        :param diff_stats: A :py:class:`parso.python.diff.DiffStats`, like in
+            :py:meth:`parse`.
+        :param bool copy_on_update: Changes a copy of the cached module, like
+            in :py:meth:`parse`.
+        :param document_version: The version id of the changed code, like in
+            :py:meth:`parse`.
+        :param int keep_versions: The amount of older versions that are kept,
+            like in :py:meth:`parse`.
+
+        :return: The changed module (the same object that is cached).
+        """
+        if self._diff_parser is None:
+            raise TypeError("You have to define a diff parser to be able "
+                            "to use this method.")
+
+        with get_diff_cache_lock(self._hashed, path):
+            try:
+                module_cache_item = parser_cache[self._hashed][path]
+            except KeyError:
+                raise ValueError("%s was not parsed with diff_cache=True." % path)
+
+            module_node = module_cache_item.node
+            old_lines = module_cache_item.lines
+            lines, line_edits = _edit_lines(old_lines, edits)
+            if not line_edits:
+                if document_version is None \
+                        or document_version == module_cache_item.document_version:
+                    return module_node
+                # The versions share the module.
+                new_node = module_node
+            else:
+                diff_parser = self._diff_parser(
+                    self._pgen_grammar, self._tokenizer, module_node
+                )
+                new_node = diff_parser.update(
+                    old_lines=old_lines,
+                    new_lines=lines,
+                    opcodes=get_edit_opcodes(len(old_lines), line_edits),
+                    reparse=True,
+                    copy=copy_on_update or bool(keep_versions),
+                )
+                if diff_stats is not None:
+                    diff_stats.merge(diff_parser.stats)
+            save_module(self._hashed, FileIO(path), new_node, lines,
+                        pickling=False, document_version=document_version,
+                        keep_versions=keep_versions)
+            return new_node
+
+    def get_cached_module(self, path, document_version=None):
+        """
+        Returns the module of ``path`` that was parsed with ``diff_cache=True``
+        or ``None`` if it's not cached.
+
+        :param document_version: Returns the module of this version instead
+            of the newest one, if it's still cached (see the
+            ``keep_versions`` option of :py:meth:`parse`).
+        """
+        with get_diff_cache_lock(self._hashed, path):
+            try:
+                module_cache_item = parser_cache[self._hashed][path]
+            except KeyError:
+                return None
+            if document_version is not None:
+                module_cache_item = module_cache_item.get_version(document_version)
+                if module_cache_item is None:
+                    return None
+            return module_cache_item.node
+
     def _parse(self, code=None, error_recovery=True, path=None,
                start_symbol=None, cache=False, diff_cache=False,
-               cache_path=None, file_io=None, start_pos=(1, 0)):
+               cache_path=None, file_io=None, start_pos=(1, 0), bodies='parse',
+               compact=False, diff_stats=None, copy_on_update=False,
+               document_version=None, keep_versions=0):
         """
         Wanted python3.5 * operator and keyword only arguments. Therefore just
         wrap it all.
@@ -95,10 +281,25 @@ class Grammar(object):
         if error_recovery and start_symbol != 'file_input':
             raise NotImplementedError("This is currently not implemented.")
 
+        if bodies not in ('parse', 'skip'):
+            raise ValueError("bodies should either be 'parse' or 'skip'.")
+
+        if bodies == 'skip' and (cache or diff_cache):
+            raise NotImplementedError("Skipping bodies is not implemented for "
+                                      "cached modules.")
+
+        if compact and diff_cache:
+            raise NotImplementedError("The diff parser doesn't create compact "
+                                      "trees.")
+
+        if (document_version is not None or keep_versions) and not diff_cache:
+            raise ValueError("Versions are only cached with diff_cache.")
+
         if file_io is None:
             if code is None:
                 file_io = FileIO(path)
-            else:
+            elif cache or diff_cache:
+                # Only needed for caching.
                 file_io = KnownContentFileIO(path, code)
 
         if cache and file_io.path is not None:
@@ -111,47 +312,162 @@ class Grammar(object):
         code = python_bytes_to_unicode(code)
 
         lines = split_lines(code, keepends=True)
+        # Never pickle in pypy, it's slow as hell.
+        pickling = cache and not is_pypy
         if diff_cache:
             if self._diff_parser is None:
                 raise TypeError("You have to define a diff parser to be able "
                                 "to use this option.")
-            try:
-                module_cache_item = parser_cache[self._hashed][file_io.path]
-            except KeyError:
-                pass
-            else:
-                module_node = module_cache_item.node
-                old_lines = module_cache_item.lines
-                if old_lines == lines:
-                    return module_node
-
-                new_node = self._diff_parser(
-                    self._pgen_grammar, self._tokenizer, module_node
-                ).update(
-                    old_lines=old_lines,
-                    new_lines=lines
+            # The diff parser changes the cached module. Make sure that only
+            # one thread at a time does that for a path.
+            with get_diff_cache_lock(self._hashed, file_io.path):
+                return self._parse_with_diff_cache(
+                    file_io, lines, error_recovery, start_symbol, start_pos,
+                    pickling=pickling, cache_path=cache_path,
+                    diff_stats=diff_stats, copy_on_update=copy_on_update,
+                    document_version=document_version,
+                    keep_versions=keep_versions,
                 )
-                save_module(self._hashed, file_io, new_node, lines,
-                            # Never pickle in pypy, it's slow as hell.
-                            pickling=cache and not is_pypy,
-                            cache_path=cache_path)
-                return new_node
 
+        root_node = self._parse_lines(lines, error_recovery, start_symbol,
+                                      start_pos, bodies, compact)
+        if cache:
+            save_module(self._hashed, file_io, root_node, lines,
+                        pickling=pickling, cache_path=cache_path)
+        return root_node
+
+    def _parse_with_diff_cache(self, file_io, lines, error_recovery,
+                               start_symbol, start_pos, pickling, cache_path,
+                               diff_stats=None, copy_on_update=False,
+                               document_version=None, keep_versions=0):
+        try:
+            module_cache_item = parser_cache[self._hashed][file_io.path]
+        except KeyError:
+            start = default_timer()
+            new_node = self._parse_lines(lines, error_recovery, start_symbol, start_pos)
+            # Only the diff parser changes this module, which keeps the
+            # issues of the unchanged statements (see ErrorFinder).
+            new_node._issue_cache = {}
+            if diff_stats is not None:
+                diff_stats.full_parses += 1
+                diff_stats.full_parse_time += default_timer() - start
+        else:
+            if document_version is not None:
+                version_item = module_cache_item.get_version(document_version)
+                if version_item is not None and version_item.lines == lines:
+                    return version_item.node
+
+            module_node = module_cache_item.node
+            old_lines = module_cache_item.lines
+            if old_lines == lines:
+                if document_version is not None \
+                        and document_version != module_cache_item.document_version:
+                    # The versions share the module.
+                    save_module(self._hashed, file_io, module_node, lines,
+                                pickling=False, document_version=document_version,
+                                keep_versions=keep_versions)
+                return module_node
+
+            diff_parser = self._diff_parser(
+                self._pgen_grammar, self._tokenizer, module_node
+            )
+            new_node = diff_parser.update(
+                old_lines=old_lines,
+                new_lines=lines,
+                reparse=True,
+                # The modules of older versions must not change.
+                copy=copy_on_update or bool(keep_versions),
+            )
+            if diff_stats is not None:
+                diff_stats.merge(diff_parser.stats)
+        save_module(self._hashed, file_io, new_node, lines,
+                    pickling=pickling, cache_path=cache_path,
+                    document_version=document_version,
+                    keep_versions=keep_versions)
+        return new_node
+
+    def _parse_lines(self, lines, error_recovery, start_symbol, start_pos,
+                     bodies='parse', compact=False):
         tokens = self._tokenizer(lines, start_pos)
 
-        p = self._parser(
+        parser_key = error_recovery, start_symbol, bodies, compact
+        p = self._acquire_parser(parser_key)
+        try:
+            return p.parse(tokens=tokens)
+        finally:
+            self._release_parser(parser_key, p)
+
+    def _acquire_parser(self, key):
+        """
+        Returns an unused parser of the current thread. Creating parsers is
+        not free and adds up if a lot of small snippets are parsed.
+        """
+        error_recovery, start_symbol, bodies, compact = key
+        try:
+            return self._parser_pool.parsers[key].pop()
+        except (KeyError, IndexError):
+            pass
+
+        parser_kwargs = {}
+        if bodies == 'skip':
+            parser_kwargs['lazy_suite_parser'] = partial(
+                self._parse_lazy_suite,
+                error_recovery=error_recovery,
+                compact=compact,
+            )
+        if compact:
+            parser_kwargs['compact'] = True
+        return self._parser(
             self._pgen_grammar,
             error_recovery=error_recovery,
-            start_nonterminal=start_symbol
+            start_nonterminal=start_symbol,
+            **parser_kwargs
         )
-        root_node = p.parse(tokens=tokens)
 
-        if cache or diff_cache:
-            save_module(self._hashed, file_io, root_node, lines,
-                        # Never pickle in pypy, it's slow as hell.
-                        pickling=cache and not is_pypy,
-                        cache_path=cache_path)
-        return root_node
+    def _release_parser(self, key, parser):
+        # Don't keep the last tree alive.
+        parser.reset()
+        self._parser_pool.parsers.setdefault(key, []).append(parser)
+
+    def _parse_lazy_suite(self, code, code_start, error_recovery=True,
+                          compact=False):
+        """
+        Parses the body of a function or class that was skipped and returns
+        the children of its suite. The code starts at ``code_start``, right
+        after the colon of the function/class.
+        """
+        # A body is not valid on its own, therefore just put an if in front of
+        # it. All the lines stay the same, only the column on the first line
+        # needs to be fixed.
+        header = 'if 1:'
+        module = self._parse(
+            header + code,
+            error_recovery=error_recovery,
+            start_pos=(code_start[0], 0),
+            bodies='skip',
+            compact=compact,
+        )
+        colon = module.children[0].get_first_leaf().get_next_leaf().get_next_leaf()
+        first_leaf = colon.get_next_leaf()
+        first_leaf.column += code_start[1] - len(header)
+
+        if_stmt, endmarker = module.children[0], module.children[-1]
+        if if_stmt.type == 'if_stmt' and if_stmt.children[-1].type == 'suite' \
+                and module.children[1] is endmarker:
+            return if_stmt.children[-1].children
+
+        # Error recovery didn't keep the suite, e.g. because the first
+        # statement of the body is invalid, or ended it early (the rest of
+        # the body is then in the module). Just keep the leaves.
+        leaves = []
+        leaf = first_leaf
+        while leaf.type != 'endmarker':
+            leaves.append(leaf)
+            leaf = leaf.get_next_leaf()
+        error_node = tree.PythonErrorNode(leaves[1:])
+        for leaf in leaves[1:]:
+            leaf.parent = error_node
+        return [leaves[0], error_node]
 
     def _get_token_namespace(self):
         ns = self._token_namespace
@@ -164,6 +480,9 @@ class Grammar(object):
         Given a :py:class:`parso.tree.NodeOrLeaf` returns a generator of
         :py:class:`parso.normalizer.Issue` objects. For Python this is
         a list of syntax/indentation errors.
+
+        For modules of ``diff_cache=True``, only the statements that changed
+        since the last call are checked again.
         """
         if self._error_normalizer_config is None:
             raise ValueError("No error normalizer specified for this grammar.")
@@ -241,6 +560,14 @@ def load_grammar(**kwargs):
             try:
                 return _loaded_grammars[path]
             except KeyError:
+                pass
+
+            with _loaded_grammars_lock:
+                # Another thread might have loaded it in the meantime.
+                try:
+                    return _loaded_grammars[path]
+                except KeyError:
+                    pass
                 try:
                     with open(path) as f:
                         bnf_text = f.read()
@@ -1,6 +1,9 @@
-from typing import Any, Callable, Generic, Optional, Sequence, TypeVar, Union
+from typing import (
+    Any, Callable, Generic, Hashable, Optional, Sequence, Tuple, TypeVar, Union
+)
 from typing_extensions import Literal
 
+from parso.python.diff import DiffStats
 from parso.utils import PythonVersionInfo
 
 _Token = Any
@@ -27,7 +30,25 @@ class Grammar(Generic[_NodeT]):
         cache: bool = ...,
         diff_cache: bool = ...,
         cache_path: Optional[str] = ...,
+        bodies: Literal["parse", "skip"] = ...,
+        compact: bool = ...,
+        diff_stats: Optional[DiffStats] = ...,
+        copy_on_update: bool = ...,
+        document_version: Optional[Hashable] = ...,
+        keep_versions: int = ...,
     ) -> _NodeT: ...
+    def apply_edits(
+        self,
+        path: str,
+        edits: Sequence[Tuple[Tuple[int, int], Tuple[int, int], str]],
+        diff_stats: Optional[DiffStats] = ...,
+        copy_on_update: bool = ...,
+        document_version: Optional[Hashable] = ...,
+        keep_versions: int = ...,
+    ) -> _NodeT: ...
+    def get_cached_module(
+        self, path: str, document_version: Optional[Hashable] = ...
+    ) -> Optional[_NodeT]: ...
 
 class PythonGrammar(Grammar):
     version_info: PythonVersionInfo
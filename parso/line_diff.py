@@ -0,0 +1,252 @@
+"""
+A differ for the lines of files, used by the diff parser instead of
+:py:class:`difflib.SequenceMatcher`, which is super-linear and was the slowest
+part of small edits in big files.
+
+Common lines at the start and the end are skipped first, so a typical edit
+only looks at a few lines. The rest is diffed like the patience diff: lines
+that are unique in both parts are matched (the longest increasing sequence of
+them) and the parts between them are diffed again. If there are no unique
+lines, the line with the fewest occurrences is used (like the histogram diff).
+Lines are compared as numbers after they were hashed once.
+
+>>> from parso.line_diff import get_opcodes
+>>> get_opcodes(['a\\n', 'b\\n', 'c\\n'], ['a\\n', 'x\\n', 'c\\n'])
+[('equal', 0, 1, 0, 1), ('replace', 1, 2, 1, 2), ('equal', 2, 3, 2, 3)]
+"""
+from bisect import bisect_left
+
+# Lines that occur more often are not used to split the lines in the histogram
+# diff, it would be too slow and is rarely useful (e.g. empty lines).
+_MAX_OCCURRENCES = 64
+
+
+def get_opcodes(old, new):
+    """
+    Returns the same kind of opcodes as
+    :py:meth:`difflib.SequenceMatcher.get_opcodes`: a list of ``(tag, i1, i2,
+    j1, j2)`` tuples that describe how to turn ``old`` into ``new``, where
+    ``tag`` is one of ``'equal'``, ``'replace'``, ``'delete'`` and
+    ``'insert'``. The opcodes are not necessarily the same as the ones of
+    difflib, because there are often multiple valid diffs.
+    """
+    return _get_opcodes(get_matching_blocks(old, new))
+
+
+def get_matching_blocks(old, new):
+    """
+    Like :py:meth:`difflib.SequenceMatcher.get_matching_blocks`, returns a
+    list of ``(i, j, size)`` tuples (``old[i:i + size] == new[j:j + size]``),
+    ordered and without adjacent blocks. The last one is always
+    ``(len(old), len(new), 0)``.
+    """
+    old_length = len(old)
+    new_length = len(new)
+    limit = min(old_length, new_length)
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    limit -= prefix
+    suffix = 0
+    while suffix < limit \
+            and old[old_length - 1 - suffix] == new[new_length - 1 - suffix]:
+        suffix += 1
+
+    blocks = []
+    if prefix:
+        blocks.append((0, 0, prefix))
+
+    # Lines are replaced with numbers, comparing them is faster.
+    hashes = {}
+    a = [hashes.setdefault(line, len(hashes))
+         for line in old[prefix:old_length - suffix]]
+    b = [hashes.setdefault(line, len(hashes))
+         for line in new[prefix:new_length - suffix]]
+    for i, j, size in _diff(a, b):
+        blocks.append((i + prefix, j + prefix, size))
+
+    if suffix:
+        blocks.append((old_length - suffix, new_length - suffix, suffix))
+    return _merge_adjacent(blocks) + [(old_length, new_length, 0)]
+
+
+def get_edit_opcodes(length, edits):
+    """
+    Returns opcodes like :py:func:`get_opcodes` for lines that were changed
+    by known edits, without comparing any lines.
+
+    :param length: The amount of lines before the edits.
+    :param edits: A list of ``(start, end, count)`` tuples: ``lines[start:end]``
+        was replaced by ``count`` lines. The indexes refer to the lines after
+        the previous edits.
+    """
+    blocks = [(0, 0, length)]
+    new_length = length
+    for start, end, count in edits:
+        offset = count - (end - start)
+        new_blocks = []
+        for i, j, size in blocks:
+            if j + size <= start:
+                new_blocks.append((i, j, size))
+            elif j >= end:
+                new_blocks.append((i, j + offset, size))
+            else:
+                # The edit is (partly) within this block, keep the rest.
+                if j < start:
+                    new_blocks.append((i, j, start - j))
+                if j + size > end:
+                    removed = end - j
+                    new_blocks.append((i + removed, end + offset, size - removed))
+        blocks = new_blocks
+        new_length += offset
+
+    blocks = [block for block in _merge_adjacent(blocks) if block[2]]
+    return _get_opcodes(blocks + [(length, new_length, 0)])
+
+
+def _get_opcodes(matching_blocks):
+    opcodes = []
+    i = j = 0
+    for ai, bj, size in matching_blocks:
+        if i < ai and j < bj:
+            opcodes.append(('replace', i, ai, j, bj))
+        elif i < ai:
+            opcodes.append(('delete', i, ai, j, bj))
+        elif j < bj:
+            opcodes.append(('insert', i, ai, j, bj))
+        if size:
+            opcodes.append(('equal', ai, ai + size, bj, bj + size))
+        i = ai + size
+        j = bj + size
+    return opcodes
+
+
+def _merge_adjacent(blocks):
+    merged = []
+    for block in blocks:
+        if merged:
+            i, j, size = merged[-1]
+            if i + size == block[0] and j + size == block[1]:
+                merged[-1] = i, j, size + block[2]
+                continue
+        merged.append(block)
+    return merged
+
+
+def _diff(a, b):
+    blocks = []
+    todo = [(0, len(a), 0, len(b))]
+    while todo:
+        alo, ahi, blo, bhi = todo.pop()
+        # Common lines at the start and the end of the part.
+        start = alo
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            alo += 1
+            blo += 1
+        if alo > start:
+            blocks.append((start, blo - (alo - start), alo - start))
+        end = ahi
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+        if ahi < end:
+            blocks.append((ahi, bhi, end - ahi))
+
+        if alo == ahi or blo == bhi:
+            continue
+        anchors = _get_unique_anchors(a, alo, ahi, b, blo, bhi)
+        if not anchors:
+            anchor = _get_rare_anchor(a, alo, ahi, b, blo, bhi)
+            if anchor is None:
+                continue
+            anchors = [anchor]
+
+        for i, j, size in anchors:
+            blocks.append((i, j, size))
+            todo.append((alo, i, blo, j))
+            alo = i + size
+            blo = j + size
+        todo.append((alo, ahi, blo, bhi))
+
+    blocks.sort()
+    return blocks
+
+
+def _get_unique_anchors(a, alo, ahi, b, blo, bhi):
+    """
+    Returns the longest increasing sequence of lines that occur exactly once
+    in both parts.
+    """
+    a_indexes = {}
+    for i in range(alo, ahi):
+        line = a[i]
+        a_indexes[line] = -1 if line in a_indexes else i
+    b_indexes = {}
+    for j in range(blo, bhi):
+        line = b[j]
+        if a_indexes.get(line, -1) != -1:
+            b_indexes[line] = -1 if line in b_indexes else j
+
+    # Patience sorting of the a indexes in the order of b.
+    tails = []
+    tail_pairs = []
+    previous = {}
+    for j in range(blo, bhi):
+        line = b[j]
+        if b_indexes.get(line) != j:
+            continue
+        pair = a_indexes[line], j
+        k = bisect_left(tails, pair[0])
+        if k == len(tails):
+            tails.append(pair[0])
+            tail_pairs.append(pair)
+        else:
+            tails[k] = pair[0]
+            tail_pairs[k] = pair
+        previous[pair] = tail_pairs[k - 1] if k else None
+
+    anchors = []
+    pair = tail_pairs[-1] if tail_pairs else None
+    while pair is not None:
+        anchors.append((pair[0], pair[1], 1))
+        pair = previous[pair]
+    anchors.reverse()
+    return anchors
+
+
+def _get_rare_anchor(a, alo, ahi, b, blo, bhi):
+    """
+    Returns the longest common block that contains the line with the fewest
+    occurrences in ``a``.
+    """
+    positions = {}
+    for i in range(alo, ahi):
+        positions.setdefault(a[i], []).append(i)
+
+    best = None
+    best_count = _MAX_OCCURRENCES
+    j = blo
+    while j < bhi:
+        next_j = j + 1
+        occurrences = positions.get(b[j])
+        if occurrences is not None and len(occurrences) <= best_count:
+            count = len(occurrences)
+            for i in occurrences:
+                start_i = i
+                start_j = j
+                while start_i > alo and start_j > blo \
+                        and a[start_i - 1] == b[start_j - 1]:
+                    start_i -= 1
+                    start_j -= 1
+                end_i = i + 1
+                end_j = j + 1
+                while end_i < ahi and end_j < bhi and a[end_i] == b[end_j]:
+                    end_i += 1
+                    end_j += 1
+                size = end_i - start_i
+                if best is None or count < best_count or size > best[2]:
+                    best = start_i, start_j, size
+                    best_count = count
+                next_j = max(next_j, end_j)
+        j = next_j
+    return best
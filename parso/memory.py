@@ -0,0 +1,216 @@
+"""
+Estimates how much memory syntax trees use. This is only meant for diagnostics
+and is not used by parso itself.
+
+All nodes and leaves use ``__slots__``, so every instance of a class has the
+same size (measured once with :py:func:`sys.getsizeof`). Nodes additionally
+own their list of children. Strings are counted once, even if multiple leaves
+share them. Numbers (like line and column) are not counted. Bodies that were
+not parsed (``bodies='skip'``) are not parsed by the report either, only their
+code is counted.
+
+>>> import parso
+>>> from parso.memory import MemoryReport, get_memory_report
+>>> report = get_memory_report(parso.parse('foo(1)\\n'))
+>>> report.classes['Name'].count
+1
+>>> report.get_report()['modules']
+1
+"""
+import sys
+
+from parso.tree import BaseNode
+
+
+class SizeCounter(object):
+    """
+    Counts objects and their estimated size in bytes.
+    """
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+
+    def add(self, size, count=1):
+        self.count += count
+        self.bytes += size
+
+    def merge(self, other):
+        self.count += other.count
+        self.bytes += other.bytes
+
+    def get_report(self):
+        return dict(count=self.count, bytes=self.bytes)
+
+
+_INDEXES = ('used_names', 'type_index', 'leaf_positions')
+
+
+class MemoryReport(object):
+    """
+    Collects the memory usage of one or more trees. Pass it to
+    :py:func:`get_memory_report`.
+    """
+    def __init__(self):
+        self.modules = 0
+        self.classes = {}
+        """
+        A dict of class names (e.g. ``Name``, ``PythonNode``) to
+        :py:class:`SizeCounter`. The bytes include the children lists of the
+        nodes, but not the strings of the leaves.
+        """
+        self.values = SizeCounter()
+        """
+        The strings that are used as values of leaves (and the code of bodies
+        that were not parsed).
+        """
+        self.prefixes = SizeCounter()
+        """
+        The strings that are used as prefixes of leaves and are not already
+        used as a value.
+        """
+        self.used_names = SizeCounter()
+        """
+        The ``UsedNamesMapping`` of modules with its dict and lists. Only
+        counted if :py:meth:`parso.python.tree.Module.get_used_names` was
+        called before.
+        """
+        self.type_index = SizeCounter()
+        """
+        The index of :py:meth:`parso.python.tree.Module.iter_nodes`.
+        """
+        self.leaf_positions = SizeCounter()
+        """
+        The index of :py:meth:`parso.python.tree.Module.get_leaf_for_position`.
+        """
+
+    def get_class_counter(self, name):
+        try:
+            return self.classes[name]
+        except KeyError:
+            counter = self.classes[name] = SizeCounter()
+            return counter
+
+    @property
+    def tree_bytes(self):
+        """
+        The bytes of the nodes, leaves and their strings.
+        """
+        return sum(c.bytes for c in self.classes.values()) \
+            + self.values.bytes + self.prefixes.bytes
+
+    @property
+    def total_bytes(self):
+        """
+        The bytes of the trees and their indexes.
+        """
+        return self.tree_bytes + sum(getattr(self, name).bytes for name in _INDEXES)
+
+    def merge(self, other):
+        """
+        Adds the results of another report to this one.
+        """
+        self.modules += other.modules
+        for name, counter in other.classes.items():
+            self.get_class_counter(name).merge(counter)
+        for name in ('values', 'prefixes') + _INDEXES:
+            getattr(self, name).merge(getattr(other, name))
+
+    def get_report(self):
+        """
+        Returns the collected data as a dict that only contains dicts, strings
+        and numbers (e.g. to dump it as JSON).
+        """
+        report = dict(
+            modules=self.modules,
+            classes=dict(
+                (name, counter.get_report())
+                for name, counter in self.classes.items()
+            ),
+            values=self.values.get_report(),
+            prefixes=self.prefixes.get_report(),
+            tree_bytes=self.tree_bytes,
+            total_bytes=self.total_bytes,
+        )
+        for name in _INDEXES:
+            report[name] = getattr(self, name).get_report()
+        return report
+
+
+def _get_instance_size(obj, class_sizes):
+    try:
+        size = class_sizes[type(obj)]
+    except KeyError:
+        size = class_sizes[type(obj)] = sys.getsizeof(obj)
+    try:
+        # Subclasses without __slots__.
+        return size + sys.getsizeof(obj.__dict__)
+    except AttributeError:
+        return size
+
+
+def _add_string(counter, string, seen):
+    if id(string) not in seen:
+        seen.add(id(string))
+        counter.add(sys.getsizeof(string))
+
+
+def _get_lists_size(dct):
+    return sys.getsizeof(dct) + sum(sys.getsizeof(lst) for lst in dct.values())
+
+
+def get_memory_report(module, report=None):
+    """
+    Estimates the memory of a tree (and the indexes of the module that were
+    already generated).
+
+    :param module: The root of a tree, usually a
+        :py:class:`parso.python.tree.Module`.
+    :param report: The :py:class:`MemoryReport` that is filled. A new one is
+        created if not given.
+    :return: The :py:class:`MemoryReport`.
+    """
+    if report is None:
+        report = MemoryReport()
+    report.modules += 1
+
+    class_sizes = {}
+    strings = set()
+    stack = [module]
+    while stack:
+        node = stack.pop()
+        size = _get_instance_size(node, class_sizes)
+        if isinstance(node, BaseNode):
+            try:
+                # Don't use the children of lazy bodies, it would parse them.
+                children = node._children
+            except AttributeError:
+                children = node.children
+            if children is None:
+                _add_string(report.values, node._code, strings)
+            else:
+                size += sys.getsizeof(children)
+                stack += children
+        else:
+            _add_string(report.values, node.value, strings)
+            _add_string(report.prefixes, node.prefix, strings)
+        report.get_class_counter(type(node).__name__).add(size)
+
+    used_names = getattr(module, '_used_names', None)
+    if used_names is not None:
+        size = _get_instance_size(used_names, {})
+        report.used_names.add(size + _get_lists_size(used_names._dict))
+
+    type_index = getattr(module, '_type_index', None)
+    if type_index is not None:
+        report.type_index.add(_get_lists_size(type_index))
+
+    leaf_positions = getattr(module, '_leaf_positions', None)
+    if leaf_positions is not None:
+        end_positions, leaves = leaf_positions
+        report.leaf_positions.add(
+            sys.getsizeof(leaf_positions)
+            + sys.getsizeof(end_positions)
+            + sum(sys.getsizeof(position) for position in end_positions)
+            + sys.getsizeof(leaves)
+        )
+    return report
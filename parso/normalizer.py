@@ -1,7 +1,12 @@
+import sys
 from contextlib import contextmanager
 
 from parso._compatibility import use_metaclass
 
+# Marks the position on the stack of Normalizer.visit where a context manager
+# of visit_node needs to be exited.
+_EXIT = object()
+
 
 class _NormalizerMeta(type):
     def __new__(cls, name, bases, dct):
@@ -36,13 +41,51 @@ class Normalizer(use_metaclass(_NormalizerMeta)):
         return value
 
     def visit(self, node):
-        try:
-            children = node.children
-        except AttributeError:
+        """
+        Visits a node or leaf and everything below it and returns the code of
+        the visited leaves. Uses a stack instead of recursion, unless a
+        subclass overwrites this method.
+        """
+        if not hasattr(node, 'children'):
             return self.visit_leaf(node)
-        else:
+
+        if type(self).visit != Normalizer.visit:
+            # The subclass expects that visit is called for every node.
             with self.visit_node(node):
-                return ''.join(self.visit(child) for child in children)
+                return ''.join(
+                    self.visit(child)
+                    for child in self._get_children_to_visit(node)
+                )
+
+        parts = []
+        stack = [node]
+        try:
+            while stack:
+                node = stack.pop()
+                if node is _EXIT:
+                    stack.pop().__exit__(None, None, None)
+                elif hasattr(node, 'children'):
+                    context_manager = self.visit_node(node)
+                    context_manager.__enter__()
+                    # The context manager is exited after all the children
+                    # are visited.
+                    stack.append(context_manager)
+                    stack.append(_EXIT)
+                    stack += self._get_children_to_visit(node)[::-1]
+                else:
+                    parts.append(self.visit_leaf(node))
+        except Exception:
+            # Like nested with statements: The context managers that are still
+            # open see the exception.
+            exc_info = sys.exc_info()
+            for i in reversed(range(len(stack))):
+                if stack[i] is _EXIT:
+                    stack[i - 1].__exit__(*exc_info)
+            raise
+        return ''.join(parts)
+
+    def _get_children_to_visit(self, node):
+        return node.children
 
     @contextmanager
     def visit_node(self, node):
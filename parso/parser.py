@@ -119,8 +119,18 @@ class BaseParser(object):
         self._pgen_grammar = pgen_grammar
         self._start_nonterminal = start_nonterminal
         self._error_recovery = error_recovery
+        self.reset()
+
+    def reset(self):
+        """
+        Resets the state of the last parse. A parser can be used for an
+        unlimited amount of :py:meth:`parse` calls (but not at the same time),
+        this is just here to free references to the last tree.
+        """
+        self.stack = None
 
     def parse(self, tokens):
+        self.reset()
         first_dfa = self._pgen_grammar.nonterminal_to_dfas[self._start_nonterminal][0]
         self.stack = Stack([StackNode(first_dfa)])
 
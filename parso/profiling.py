@@ -0,0 +1,224 @@
+"""
+Instrumentation for the parser. This is opt-in: the normal parsers are never
+touched, profiling is done with subclasses of them that count what the parser
+is doing. Therefore there is no overhead if profiling is not used.
+
+>>> import parso
+>>> from parso.profiling import ParserProfile, profile_parse
+>>> profile = ParserProfile()
+>>> module = profile_parse(parso.load_grammar(), 'foo(1)\\n', profile)
+>>> profile.nonterminals['trailer'].shifts
+2
+>>> profile.get_report()['error_recoveries']
+0
+"""
+from timeit import default_timer
+
+from parso.utils import split_lines, python_bytes_to_unicode
+
+
+class NonterminalCounter(object):
+    """
+    Counts what happened to one nonterminal of the grammar.
+    """
+    def __init__(self):
+        self.shifts = 0
+        """
+        The amount of leaves that were added to this nonterminal.
+        """
+        self.pops = 0
+        """
+        How many times a finished nonterminal was popped from the stack.
+        """
+        self.removals = 0
+        """
+        How many times the nonterminal was thrown away by error recovery.
+        """
+
+    @property
+    def pushes(self):
+        """
+        How many times this nonterminal was pushed on the stack. Every pushed
+        stack node is either popped or removed by the error recovery.
+        """
+        return self.pops + self.removals
+
+    def merge(self, other):
+        self.shifts += other.shifts
+        self.pops += other.pops
+        self.removals += other.removals
+
+    def get_report(self):
+        return dict(
+            shifts=self.shifts,
+            pushes=self.pushes,
+            pops=self.pops,
+            removals=self.removals,
+        )
+
+
+class _TimedCall(object):
+    def __init__(self):
+        self.calls = 0
+        self.time = 0.0
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.time += other.time
+
+    def get_report(self):
+        return dict(calls=self.calls, time=self.time)
+
+
+class ParserProfile(object):
+    """
+    Collects the statistics of one or more parser runs. Pass it to
+    :py:func:`profile_parse` or :py:func:`create_profiling_parser`.
+    """
+    def __init__(self):
+        self.nonterminals = {}
+        """
+        A dict of nonterminal names to :py:class:`NonterminalCounter`.
+        """
+        self.error_recoveries = 0
+        self.stack_removal_sizes = {}
+        """
+        A dict that maps the amount of removed stack nodes in
+        ``_stack_removal`` to how often that happened.
+        """
+        self.convert_node = _TimedCall()
+        self.convert_leaf = _TimedCall()
+        self.parse_time = 0.0
+
+    def get_counter(self, nonterminal):
+        try:
+            return self.nonterminals[nonterminal]
+        except KeyError:
+            counter = self.nonterminals[nonterminal] = NonterminalCounter()
+            return counter
+
+    def merge(self, other):
+        """
+        Adds the results of another profile to this one.
+        """
+        for nonterminal, counter in other.nonterminals.items():
+            self.get_counter(nonterminal).merge(counter)
+        self.error_recoveries += other.error_recoveries
+        for size, count in other.stack_removal_sizes.items():
+            self.stack_removal_sizes[size] = \
+                self.stack_removal_sizes.get(size, 0) + count
+        self.convert_node.merge(other.convert_node)
+        self.convert_leaf.merge(other.convert_leaf)
+        self.parse_time += other.parse_time
+
+    def get_report(self):
+        """
+        Returns the collected data as a dict that only contains dicts, strings
+        and numbers (e.g. to dump it as JSON).
+        """
+        return dict(
+            nonterminals=dict(
+                (nonterminal, counter.get_report())
+                for nonterminal, counter in self.nonterminals.items()
+            ),
+            error_recoveries=self.error_recoveries,
+            stack_removal_sizes=dict(
+                (str(size), count)
+                for size, count in self.stack_removal_sizes.items()
+            ),
+            convert_node=self.convert_node.get_report(),
+            convert_leaf=self.convert_leaf.get_report(),
+            parse_time=self.parse_time,
+        )
+
+
+_profiling_parser_classes = {}
+
+
+def create_profiling_parser(parser_class):
+    """
+    Returns a subclass of ``parser_class`` that takes an additional
+    ``profile`` keyword argument and writes its statistics to that
+    :py:class:`ParserProfile`.
+    """
+    try:
+        return _profiling_parser_classes[parser_class]
+    except KeyError:
+        pass
+
+    class ProfilingParser(parser_class):
+        def __init__(self, *args, **kwargs):
+            profile = kwargs.pop('profile', None)
+            super(ProfilingParser, self).__init__(*args, **kwargs)
+            self.profile = ParserProfile() if profile is None else profile
+
+        def parse(self, tokens):
+            start = default_timer()
+            try:
+                return super(ProfilingParser, self).parse(tokens)
+            finally:
+                self.profile.parse_time += default_timer() - start
+
+        def convert_node(self, nonterminal, children):
+            timed_call = self.profile.convert_node
+            start = default_timer()
+            node = super(ProfilingParser, self).convert_node(nonterminal, children)
+            timed_call.time += default_timer() - start
+            timed_call.calls += 1
+            return node
+
+        def convert_leaf(self, type_, value, prefix, start_pos):
+            timed_call = self.profile.convert_leaf
+            start = default_timer()
+            leaf = super(ProfilingParser, self).convert_leaf(type_, value, prefix, start_pos)
+            timed_call.time += default_timer() - start
+            timed_call.calls += 1
+            # convert_leaf is only called right before the leaf is shifted.
+            self.profile.get_counter(self.stack[-1].nonterminal).shifts += 1
+            return leaf
+
+        def error_recovery(self, token):
+            self.profile.error_recoveries += 1
+            return super(ProfilingParser, self).error_recovery(token)
+
+        def _pop(self):
+            self.profile.get_counter(self.stack[-1].nonterminal).pops += 1
+            return super(ProfilingParser, self)._pop()
+
+    if hasattr(parser_class, '_stack_removal'):
+        def _stack_removal(self, start_index):
+            removed = self.stack[start_index:]
+            for stack_node in removed:
+                self.profile.get_counter(stack_node.nonterminal).removals += 1
+            sizes = self.profile.stack_removal_sizes
+            sizes[len(removed)] = sizes.get(len(removed), 0) + 1
+            return super(ProfilingParser, self)._stack_removal(start_index)
+
+        ProfilingParser._stack_removal = _stack_removal
+
+    ProfilingParser.__name__ = 'Profiling' + parser_class.__name__
+    _profiling_parser_classes[parser_class] = ProfilingParser
+    return ProfilingParser
+
+
+def profile_parse(grammar, code, profile, error_recovery=True,
+                  start_symbol=None):
+    """
+    Parses ``code`` like :py:meth:`parso.Grammar.parse` (without caching),
+    but collects statistics about the parser in ``profile``.
+
+    :param grammar: A :py:class:`parso.Grammar`.
+    :param profile: The :py:class:`ParserProfile` that is filled.
+    :return: The parsed module.
+    """
+    if start_symbol is None:
+        start_symbol = grammar._start_nonterminal
+
+    lines = split_lines(python_bytes_to_unicode(code), keepends=True)
+    parser = create_profiling_parser(grammar._parser)(
+        grammar._pgen_grammar,
+        error_recovery=error_recovery,
+        start_nonterminal=start_symbol,
+        profile=profile,
+    )
+    return parser.parse(tokens=grammar._tokenizer(lines, (1, 0)))
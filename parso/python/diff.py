@@ -7,12 +7,17 @@ fragments.
 """
 import re
 import difflib
+import gc
 from collections import namedtuple
 import logging
+from timeit import default_timer
 
+from parso.line_diff import get_opcodes
+from parso.tree import BaseNode, iter_descendants
 from parso.utils import split_lines
 from parso.python.parser import Parser
-from parso.python.tree import EndMarker
+from parso.python.tree import EndMarker, UsedNamesMapping, _create_used_names, \
+    _create_type_index
 from parso.python.tokenize import PythonToken
 from parso.python.token import PythonTokenTypes
 
@@ -21,6 +26,29 @@ DEBUG_DIFF_PARSER = False
 
 _INDENTATION_TOKENS = 'INDENT', 'ERROR_DEDENT', 'DEDENT'
 
+# Every changed part of the code costs about as much as parsing this many lines
+# (the parser has to find a safe start and end around it). If the changed lines
+# and the changed parts cost more than the whole code, parsing everything is
+# faster. Measured with the modifications of test/fuzz_diff_parser.py and with
+# formatter-like changes of parso's own files: the diff parser was slower from
+# around one changed part per ten lines on.
+_CHANGED_PART_COST = 8
+# Parsing small files is fast anyway and the diff parser keeps the nodes of the
+# unchanged code (which e.g. caches of nodes rely on).
+_MIN_REPARSE_LINES = 100
+
+
+def _iter_lines(lines, start):
+    """
+    Like ``iter(lines[start:])``, but doesn't copy the list. The tokenizer
+    usually only needs a few lines, but there can be a lot of parser runs.
+    """
+    index = start
+    length = len(lines)
+    while index < length:
+        yield lines[index]
+        index += 1
+
 
 def _get_previous_leaf_if_indentation(leaf):
     while leaf and leaf.type == 'error_leaf' \
@@ -42,6 +70,12 @@ def _assert_valid_graph(node):
 
     This is a check that only runs during debugging/testing.
     """
+    _assert_valid_node(node)
+    for descendant in iter_descendants(node):
+        _assert_valid_node(descendant)
+
+
+def _assert_valid_node(node):
     try:
         children = node.children
     except AttributeError:
@@ -73,9 +107,28 @@ def _assert_valid_graph(node):
 
         assert node.start_pos == actual, (node.start_pos, actual)
     else:
-        for child in children:
+        for i, child in enumerate(children):
             assert child.parent == node, (node, child)
-            _assert_valid_graph(child)
+            assert child._get_index_in_parent() == i, (node, child)
+
+
+def _assert_same_index(index, expected):
+    assert sorted(index) == sorted(expected)
+    for key, nodes in expected.items():
+        assert len(index[key]) == len(nodes), key
+        for node, expected_node in zip(index[key], nodes):
+            assert node is expected_node, (node, expected_node)
+
+
+def _assert_valid_indexes(module):
+    """
+    Checks if the updated used names and type index of a module are the same
+    as newly generated ones.
+    """
+    if module._used_names is not None:
+        _assert_same_index(module._used_names, _create_used_names(module))
+    if module._type_index is not None:
+        _assert_same_index(module._type_index, _create_type_index(module))
 
 
 def _get_debug_error_message(module, old_lines, new_lines):
@@ -161,40 +214,367 @@ def _is_flow_node(node):
     return value in ('if', 'for', 'while', 'try', 'with')
 
 
-class _PositionUpdatingFinished(Exception):
-    pass
+def _get_last_suite(node):
+    while node.type != 'suite':
+        node = node.children[-1]
+    return node
 
 
-def _update_positions(nodes, line_offset, last_leaf):
-    for node in nodes:
+def _add_new_nodes(nodes, containers, new_nodes):
+    stack = nodes[::-1]
+    while stack:
+        node = stack.pop()
+        new_nodes.append(node)
+        # The children of containers are collected separately.
+        if id(node) not in containers:
+            try:
+                children = node.children
+            except AttributeError:
+                pass
+            else:
+                stack += children[::-1]
+
+
+def _add_removed_nodes(nodes, containers, copied, removed_nodes):
+    stack = nodes[::-1]
+    while stack:
+        node = stack.pop()
+        if id(node) in copied:
+            # The suite of the last copied class or function might have been
+            # only partially copied.
+            if _func_or_class_has_suite(node):
+                suite = _get_last_suite(node)
+                if id(suite) in containers:
+                    stack += suite.children[::-1]
+            continue
+
+        removed_nodes.append(node)
         try:
             children = node.children
         except AttributeError:
-            # Is a leaf
+            pass
+        else:
+            stack += children[::-1]
+
+
+def _bisect_start_pos(nodes, position, lo):
+    hi = len(nodes)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if nodes[mid].start_pos < position:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _group_by(nodes, get_key):
+    dct = {}
+    for node in nodes:
+        dct.setdefault(get_key(node), []).append(node)
+    return dct
+
+
+def _remove_from_index(dct, removed_nodes, get_key):
+    """
+    Removes nodes from the lists of an index (the lists are replaced, not
+    modified). Since the lists are ordered like the tree, the nodes are found
+    with a binary search. The old positions are needed for that, therefore
+    this is done before the positions are updated.
+
+    Returns False if a node is not in the index, e.g. because the tree was
+    changed by hand. The index is wrong then and should be created again.
+    """
+    for key, removed in _group_by(removed_nodes, get_key).items():
+        nodes = dct.get(key, [])
+        new_nodes = []
+        lo = 0
+        for node in removed:
+            i = _bisect_start_pos(nodes, node.start_pos, lo)
+            while i < len(nodes) and nodes[i] is not node:
+                i += 1
+            if i == len(nodes):
+                return False
+            new_nodes += nodes[lo:i]
+            lo = i + 1
+        new_nodes += nodes[lo:]
+        if new_nodes:
+            dct[key] = new_nodes
+        else:
+            del dct[key]
+    return True
+
+
+def _add_to_index(dct, added_nodes, get_key):
+    """
+    Adds nodes to the lists of an index (the lists are replaced, not
+    modified), so that they are ordered like the tree.
+    """
+    for key, added in _group_by(added_nodes, get_key).items():
+        nodes = dct.get(key, [])
+        # The nodes of a group are in tree order and nested nodes that start
+        # at the same position stay in that order.
+        added.sort(key=lambda node: node.start_pos)
+        new_nodes = []
+        lo = 0
+        for node in added:
+            i = _bisect_start_pos(nodes, node.start_pos, lo)
+            new_nodes += nodes[lo:i]
+            new_nodes.append(node)
+            lo = i
+        new_nodes += nodes[lo:]
+        dct[key] = new_nodes
+
+
+def _get_value(leaf):
+    return leaf.value
+
+
+def _get_type(node):
+    return node.type
+
+
+def _update_positions(nodes, line_offset, last_leaf):
+    """
+    Moves all leaves of ``nodes`` up to ``last_leaf`` by ``line_offset``
+    lines. Leaves store absolute positions, therefore every leaf has to be
+    changed and inserting code at the top of a file is O(file), this is the
+    hot loop then. The loop only avoids the recursion and the exceptions of a
+    recursive walk, it's not a lot faster than that (about 2x).
+    """
+    stack = nodes[::-1]
+    pop = stack.pop
+    while stack:
+        node = pop()
+        if isinstance(node, BaseNode):
+            stack += node.children[::-1]
+        else:
             node.line += line_offset
             if node is last_leaf:
-                raise _PositionUpdatingFinished
-        else:
-            _update_positions(children, line_offset, last_leaf)
+                return
+
+
+def _is_reparse_cheaper(opcodes, line_count):
+    if line_count < _MIN_REPARSE_LINES:
+        return False
+    cost = 0
+    for operation, i1, i2, j1, j2 in opcodes:
+        if operation != 'equal':
+            cost += j2 - j1 + _CHANGED_PART_COST
+    return cost > line_count
+
+
+# The parts of nodes and leaves that are not copied by _copy_instance.
+_TREE_SLOTS = ('children', 'parent')
+_slot_names = {}
+
+
+def _get_slot_names(cls):
+    try:
+        return _slot_names[cls]
+    except KeyError:
+        names = _slot_names[cls] = tuple(
+            name
+            for klass in cls.__mro__
+            for name in klass.__dict__.get('__slots__', ())
+            if name not in _TREE_SLOTS
+        )
+        return names
+
+
+def _copy_instance(obj):
+    cls = type(obj)
+    new = cls.__new__(cls)
+    for name in _get_slot_names(cls):
+        try:
+            setattr(new, name, getattr(obj, name))
+        except AttributeError:
+            # Not set, e.g. _index_in_parent.
+            pass
+    return new
+
+
+def _copy_module(module):
+    """
+    Copies all nodes and leaves of a module, which is a lot faster than
+    parsing it again. The strings of the leaves are shared, but the nodes and
+    leaves can't be, because they refer to their parents. The copy therefore
+    takes time and memory for the whole module, even if only a line changes.
+    """
+    new_module = _copy_instance(module)
+    new_module.parent = None
+    # The indexes contain the old nodes.
+    new_module._used_names = None
+    new_module._type_index = None
+    new_module._leaf_positions = None
+    stack = [(module, new_module)]
+    # Like unpickling, this is a lot faster without GC, it would check all the
+    # new nodes over and over again. If GC was disabled by the caller, it
+    # stays disabled.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while stack:
+            node, new_node = stack.pop()
+            new_children = []
+            for child in node.children:
+                new_child = _copy_instance(child)
+                new_child.parent = new_node
+                new_children.append(new_child)
+                if isinstance(child, BaseNode):
+                    stack.append((child, new_child))
+            new_node.children = new_children
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    if module._issue_cache is not None:
+        new_module._issue_cache = _copy_issue_cache(module, new_module)
+    return new_module
+
+
+def _copy_issue_cache(module, new_module):
+    """
+    Returns the issue cache (see ``ErrorFinder``) of a copied module, the
+    cached issues and names refer to the copied nodes.
+    """
+    def get_copy(node, child, new_child):
+        # The same child indexes lead to the copy of the node.
+        indexes = []
+        while node is not child:
+            indexes.append(node._get_index_in_parent())
+            node = node.parent
+        new_node = new_child
+        for index in reversed(indexes):
+            new_node = new_node.children[index]
+        return new_node
+
+    issue_cache = module._issue_cache
+    new_cache = {}
+    for child, new_child in zip(module.children, new_module.children):
+        cached = issue_cache.get(child)
+        if cached is not None:
+            new_cache[new_child] = cached._replace(
+                issues=[(code, message, get_copy(node, child, new_child))
+                        for code, message, node in cached.issues],
+                names=[get_copy(name, child, new_child) for name in cached.names],
+                nonlocal_names=[get_copy(name, child, new_child)
+                                for name in cached.nonlocal_names],
+            )
+    return new_cache
+
+
+class DiffStats(object):
+    """
+    Statistics of diff parser updates. Pass an instance as ``diff_stats`` to
+    :py:meth:`parso.Grammar.parse` to get the statistics of an update (or of
+    a lot of updates, if the same instance is passed every time). Times are
+    in seconds.
+    """
+    def __init__(self):
+        self.updates = 0
+        """
+        The amount of updates of a cached module by the diff parser.
+        """
+        self.full_parses = 0
+        """
+        How many times the whole code was parsed instead, because there was no
+        cached module yet or because most of the code changed.
+        """
+        self.opcodes = {}
+        """
+        A dict of the tags of the line diff opcodes (``'equal'``,
+        ``'replace'``, ``'insert'``, ``'delete'``) to how often they were
+        processed.
+        """
+        self.copies = 0
+        self.copied_lines = 0
+        self.parser_runs = 0
+        """
+        The amount of partial parses.
+        """
+        self.parsed_lines = 0
+        self.diff_time = 0.0
+        self.copy_time = 0.0
+        self.parse_time = 0.0
+        self.module_copy_time = 0.0
+        """
+        The time of copying the module before updating it with ``copy=True``.
+        """
+        self.update_time = 0.0
+        """
+        The whole time of the updates, including diffing, copying, parsing and
+        updating the positions and indexes.
+        """
+        self.max_update_time = 0.0
+        """
+        The time of the slowest update.
+        """
+        self.full_parse_time = 0.0
+
+    def merge(self, other):
+        """
+        Adds the statistics of other updates to these ones.
+        """
+        self.updates += other.updates
+        self.full_parses += other.full_parses
+        for tag, count in other.opcodes.items():
+            self.opcodes[tag] = self.opcodes.get(tag, 0) + count
+        self.copies += other.copies
+        self.copied_lines += other.copied_lines
+        self.parser_runs += other.parser_runs
+        self.parsed_lines += other.parsed_lines
+        self.diff_time += other.diff_time
+        self.copy_time += other.copy_time
+        self.parse_time += other.parse_time
+        self.module_copy_time += other.module_copy_time
+        self.update_time += other.update_time
+        self.max_update_time = max(self.max_update_time, other.max_update_time)
+        self.full_parse_time += other.full_parse_time
+
+    def get_report(self):
+        """
+        Returns the statistics as a dict that only contains dicts, strings and
+        numbers (e.g. to dump it as JSON).
+        """
+        return dict(
+            updates=self.updates,
+            full_parses=self.full_parses,
+            opcodes=dict(self.opcodes),
+            copies=self.copies,
+            copied_lines=self.copied_lines,
+            parser_runs=self.parser_runs,
+            parsed_lines=self.parsed_lines,
+            diff_time=self.diff_time,
+            copy_time=self.copy_time,
+            parse_time=self.parse_time,
+            module_copy_time=self.module_copy_time,
+            update_time=self.update_time,
+            max_update_time=self.max_update_time,
+            full_parse_time=self.full_parse_time,
+        )
 
 
 class DiffParser(object):
     """
     An advanced form of parsing a file faster. Unfortunately comes with huge
-    side effects. It changes the given module.
+    side effects. It changes the given module (unless ``copy=True`` is passed
+    to :py:meth:`update`).
     """
     def __init__(self, pgen_grammar, tokenizer, module):
         self._pgen_grammar = pgen_grammar
         self._tokenizer = tokenizer
         self._module = module
+        self.stats = DiffStats()
+        """
+        The :py:class:`DiffStats` of the last update.
+        """
 
     def _reset(self):
-        self._copy_count = 0
-        self._parser_count = 0
-
         self._nodes_tree = _NodesTree(self._module)
 
-    def update(self, old_lines, new_lines):
+    def update(self, old_lines, new_lines, opcodes=None, reparse=False,
+               copy=False):
         '''
         The algorithm works as follows:
 
@@ -208,24 +588,64 @@ class DiffParser(object):
             - Parse from parsed_until_line + 1 to min(j2 + 1), hopefully not
               much more.
 
+        If the changes are already known, ``opcodes`` (like the ones of
+        :py:func:`parso.line_diff.get_opcodes`) can be passed, then the lines
+        are not diffed.
+
+        With ``reparse``, the whole code is parsed instead if that is probably
+        faster, because a lot of the code changed. The children of the module
+        are replaced in that case, the module stays the same object.
+
+        With ``copy``, the given module is not changed. It is copied first (or
+        the whole code is parsed into a new module) and the copy is changed.
+        The copy shares the strings of the leaves with the given module.
+
         Returns the new module node.
         '''
         LOG.debug('diff parser start')
-        # Reset the used names cache so they get regenerated.
-        self._module._used_names = None
-
+        update_start = default_timer()
+        self.stats = stats = DiffStats()
         self._parser_lines_new = new_lines
-
-        self._reset()
-
         line_length = len(new_lines)
-        sm = difflib.SequenceMatcher(None, old_lines, self._parser_lines_new)
-        opcodes = sm.get_opcodes()
+        if opcodes is None:
+            start = default_timer()
+            opcodes = get_opcodes(old_lines, new_lines)
+            stats.diff_time = default_timer() - start
         LOG.debug('line_lengths old: %s; new: %s' % (len(old_lines), line_length))
 
+        if reparse and _is_reparse_cheaper(opcodes, line_length):
+            LOG.debug('diff parser reparses everything')
+            start = default_timer()
+            self._reparse(new_lines, copy)
+            stats.full_parses = 1
+            stats.full_parse_time = default_timer() - start
+            return self._module
+
+        stats.updates = 1
+        if copy:
+            start = default_timer()
+            self._module = _copy_module(self._module)
+            stats.module_copy_time = default_timer() - start
+
+        # If the used names and the type index were already generated, they
+        # are updated with the nodes that were not copied. The position index
+        # is regenerated.
+        used_names = self._module._used_names
+        type_index = self._module._type_index
+        # The cached issues of the statements that are copied unchanged are
+        # kept.
+        issue_cache = self._module._issue_cache
+        self._module._used_names = None
+        self._module._type_index = None
+        self._module._leaf_positions = None
+        self._module._issue_cache = None
+
+        self._reset()
+
         for operation, i1, i2, j1, j2 in opcodes:
             LOG.debug('-> code[%s] old[%s:%s] new[%s:%s]',
                       operation, i1 + 1, i2, j1 + 1, j2)
+            stats.opcodes[operation] = stats.opcodes.get(operation, 0) + 1
 
             if j2 == line_length and new_lines[-1] == '':
                 # The empty part after the last newline is not relevant.
@@ -241,16 +661,48 @@ class DiffParser(object):
             else:
                 assert operation == 'delete'
 
+        if used_names is not None or type_index is not None:
+            # Needs to happen before closing, because that changes the old
+            # nodes and their positions.
+            removed_nodes, added_nodes = self._nodes_tree.get_changed_nodes()
+            if used_names is not None:
+                used_names = dict(used_names)
+                removed_names = [n for n in removed_nodes if n.type == 'name']
+                if not _remove_from_index(used_names, removed_names, _get_value):
+                    used_names = None
+            if type_index is not None:
+                type_index = dict(type_index)
+                if not _remove_from_index(type_index, removed_nodes, _get_type):
+                    type_index = None
+        if issue_cache is not None:
+            unchanged = self._nodes_tree.get_unchanged_module_children()
+            issue_cache = dict(
+                (node, cached) for node, cached in issue_cache.items()
+                if node in unchanged
+            )
+
         # With this action all change will finally be applied and we have a
         # changed module.
         self._nodes_tree.close()
 
+        if used_names is not None:
+            added_names = [n for n in added_nodes if n.type == 'name']
+            _add_to_index(used_names, added_names, _get_value)
+            self._module._used_names = UsedNamesMapping(used_names)
+        if type_index is not None:
+            # The endmarker is always new.
+            added_nodes.append(self._module.children[-1])
+            _add_to_index(type_index, added_nodes, _get_type)
+            self._module._type_index = type_index
+        self._module._issue_cache = issue_cache
+
         if DEBUG_DIFF_PARSER:
             # If there is reasonable suspicion that the diff parser is not
             # behaving well, this should be enabled.
             try:
                 assert self._module.get_code() == ''.join(new_lines)
                 _assert_valid_graph(self._module)
+                _assert_valid_indexes(self._module)
             except AssertionError:
                 print(_get_debug_error_message(self._module, old_lines, new_lines))
                 raise
@@ -261,9 +713,28 @@ class DiffParser(object):
                 ('(%s != %s) ' % (last_pos, line_length))
                 + _get_debug_error_message(self._module, old_lines, new_lines)
             )
+        stats.update_time = stats.max_update_time = default_timer() - update_start
         LOG.debug('diff parser end')
         return self._module
 
+    def _reparse(self, lines, copy):
+        new_module = Parser(self._pgen_grammar, error_recovery=True).parse(
+            tokens=self._tokenizer(lines, (1, 0)),
+        )
+        if self._module._issue_cache is not None:
+            new_module._issue_cache = {}
+        if copy:
+            self._module = new_module
+            return
+
+        self._module.children = new_module.children
+        for child in new_module.children:
+            child.parent = self._module
+        self._module._used_names = None
+        self._module._type_index = None
+        self._module._leaf_positions = None
+        self._module._issue_cache = new_module._issue_cache
+
     def _enabled_debugging(self, old_lines, lines_new):
         if self._module.get_code() != ''.join(lines_new):
             LOG.warning('parser issue:\n%s\n%s', ''.join(old_lines), ''.join(lines_new))
@@ -283,16 +754,18 @@ class DiffParser(object):
                 index = p_children.index(line_stmt)
 
                 from_ = self._nodes_tree.parsed_until_line + 1
+                start = default_timer()
                 copied_nodes = self._nodes_tree.copy_nodes(
                     p_children[index:],
                     until_line_old,
                     line_offset
                 )
+                self.stats.copy_time += default_timer() - start
                 # Match all the nodes that are in the wanted range.
                 if copied_nodes:
-                    self._copy_count += 1
-
                     to = self._nodes_tree.parsed_until_line
+                    self.stats.copies += 1
+                    self.stats.copied_lines += to - from_ + 1
 
                     LOG.debug('copy old[%s:%s] new[%s:%s]',
                               copied_nodes[0].start_pos[0],
@@ -307,7 +780,11 @@ class DiffParser(object):
             last_until_line = self._nodes_tree.parsed_until_line
 
     def _get_old_line_stmt(self, old_line):
-        leaf = self._module.get_leaf_for_position((old_line, 0), include_prefixes=True)
+        # The positions of the old module change while nodes are copied,
+        # therefore the position index of the module cannot be used.
+        leaf = BaseNode.get_leaf_for_position(
+            self._module, (old_line, 0), include_prefixes=True
+        )
 
         if _ends_with_newline(leaf):
             leaf = leaf.get_next_leaf()
@@ -328,23 +805,31 @@ class DiffParser(object):
         Parses at least until the given line, but might just parse more until a
         valid state is reached.
         """
+        stats = self.stats
         last_until_line = 0
-        while until_line > self._nodes_tree.parsed_until_line:
+        parsed_until_line = self._nodes_tree.parsed_until_line
+        while until_line > parsed_until_line:
+            start = default_timer()
             node = self._try_parse_part(until_line)
             nodes = node.children
 
             self._nodes_tree.add_parsed_nodes(nodes)
+            stats.parse_time += default_timer() - start
+            stats.parser_runs += 1
+            previous_until_line = parsed_until_line
+            parsed_until_line = self._nodes_tree.parsed_until_line
+            stats.parsed_lines += parsed_until_line - previous_until_line
             LOG.debug(
                 'parse_part from %s to %s (to %s in part parser)',
                 nodes[0].get_start_pos_of_prefix()[0],
-                self._nodes_tree.parsed_until_line,
+                parsed_until_line,
                 node.end_pos[0] - 1
             )
             # Since the tokenizer sometimes has bugs, we cannot be sure that
             # this loop terminates. Therefore assert that there's always a
             # change.
-            assert last_until_line != self._nodes_tree.parsed_until_line, last_until_line
-            last_until_line = self._nodes_tree.parsed_until_line
+            assert last_until_line != parsed_until_line, last_until_line
+            last_until_line = parsed_until_line
 
     def _try_parse_part(self, until_line):
         """
@@ -352,11 +837,8 @@ class DiffParser(object):
         until a certain position (or a bit longer if the statement hasn't
         ended.
         """
-        self._parser_count += 1
-        # TODO speed up, shouldn't copy the whole list all the time.
-        # memoryview?
         parsed_until_line = self._nodes_tree.parsed_until_line
-        lines_after = self._parser_lines_new[parsed_until_line:]
+        lines_after = _iter_lines(self._parser_lines_new, parsed_until_line)
         tokens = self._diff_tokenize(
             lines_after,
             until_line,
@@ -427,7 +909,10 @@ class DiffParser(object):
 
 
 class _NodesTreeNode(object):
-    _ChildrenGroup = namedtuple('_ChildrenGroup', 'prefix children line_offset last_line_offset_leaf')
+    _ChildrenGroup = namedtuple(
+        '_ChildrenGroup',
+        'prefix children line_offset last_line_offset_leaf copied'
+    )
 
     def __init__(self, tree_node, parent=None):
         self.tree_node = tree_node
@@ -437,18 +922,14 @@ class _NodesTreeNode(object):
 
     def finish(self):
         children = []
-        for prefix, children_part, line_offset, last_line_offset_leaf in self._children_groups:
+        for prefix, children_part, line_offset, last_line_offset_leaf, _ in self._children_groups:
             first_leaf = _get_next_leaf_if_indentation(
                 children_part[0].get_first_leaf()
             )
 
             first_leaf.prefix = prefix + first_leaf.prefix
             if line_offset != 0:
-                try:
-                    _update_positions(
-                        children_part, line_offset, last_line_offset_leaf)
-                except _PositionUpdatingFinished:
-                    pass
+                _update_positions(children_part, line_offset, last_line_offset_leaf)
             children += children_part
         self.tree_node.children = children
         # Reset the parents
@@ -461,10 +942,12 @@ class _NodesTreeNode(object):
     def add_child_node(self, child_node):
         self._node_children.append(child_node)
 
-    def add_tree_nodes(self, prefix, children, line_offset=0, last_line_offset_leaf=None):
+    def add_tree_nodes(self, prefix, children, line_offset=0, last_line_offset_leaf=None,
+                       copied=False):
         if last_line_offset_leaf is None:
             last_line_offset_leaf = children[-1].get_last_leaf()
-        group = self._ChildrenGroup(prefix, children, line_offset, last_line_offset_leaf)
+        group = self._ChildrenGroup(
+            prefix, children, line_offset, last_line_offset_leaf, copied)
         self._children_groups.append(group)
 
     def get_last_line(self, suffix):
@@ -630,9 +1113,7 @@ class _NodesTree(object):
         last_node = new_nodes[-1]
         had_valid_suite_last = False
         if _func_or_class_has_suite(last_node):
-            suite = last_node
-            while suite.type != 'suite':
-                suite = suite.children[-1]
+            suite = _get_last_suite(last_node)
 
             suite_tos = _NodesTreeNode(suite)
             # Don't need to pass line_offset here, it's already done by the
@@ -688,12 +1169,63 @@ class _NodesTree(object):
                 assert last_line_offset_leaf == ':'
             else:
                 last_line_offset_leaf = new_nodes[-1].get_last_leaf()
-            tos.add_tree_nodes(prefix, new_nodes, line_offset, last_line_offset_leaf)
+            tos.add_tree_nodes(prefix, new_nodes, line_offset, last_line_offset_leaf,
+                               copied=True)
             prefix = new_prefix
             self._prefix_remainder = ''
 
         return new_nodes, working_stack, prefix
 
+    def get_unchanged_module_children(self):
+        """
+        Returns the children of the module that were copied completely, only
+        their positions and prefixes changed. This needs to be called before
+        ``close``.
+        """
+        unchanged = set()
+        for group in self._base_node._children_groups:
+            if group.copied:
+                unchanged.update(group.children)
+
+        # Functions and classes, whose suites were only copied partly or got
+        # new nodes, are changed.
+        todo = list(self._base_node._node_children)
+        while todo:
+            node = todo.pop()
+            todo += node._node_children
+            tree_node = node.tree_node
+            while tree_node.parent is not None and tree_node.parent is not self._module:
+                tree_node = tree_node.parent
+            unchanged.discard(tree_node)
+        return unchanged
+
+    def get_changed_nodes(self):
+        """
+        Returns the nodes and leaves of the old module that were not copied
+        and the newly parsed ones. This needs to be called before ``close``.
+        """
+        tree_nodes = []
+        todo = [self._base_node]
+        while todo:
+            node = todo.pop()
+            tree_nodes.append(node)
+            todo += node._node_children
+        # The children of these nodes are replaced by the children groups.
+        containers = set(id(node.tree_node) for node in tree_nodes)
+
+        copied = set()
+        added_nodes = []
+        for node in tree_nodes:
+            for group in node._children_groups:
+                if group.copied:
+                    copied.update(id(child) for child in group.children)
+                else:
+                    _add_new_nodes(group.children, containers, added_nodes)
+
+        removed_nodes = []
+        _add_removed_nodes(self._module.children, containers, copied, removed_nodes)
+        return removed_nodes, added_nodes
+
     def close(self):
         self._base_node.finish()
 
@@ -2,6 +2,7 @@
 import codecs
 import warnings
 import re
+from collections import namedtuple
 from contextlib import contextmanager
 
 from parso.normalizer import Normalizer, NormalizerConfig, Issue, Rule
@@ -18,6 +19,13 @@ ALLOWED_FUTURES = (
 )
 _COMP_FOR_TYPES = ('comp_for', 'sync_comp_for')
 
+# What the error finder remembers about a statement of a module: The issues
+# that were found in it and what it added to the context of the module.
+_CachedStatement = namedtuple(
+    '_CachedStatement',
+    'version issues names nonlocal_names'
+)
+
 
 def _iter_stmts(scope):
     """
@@ -135,6 +143,8 @@ class _Context(object):
         self._nonlocal_names = []
         self._nonlocal_names_in_subscopes = []
         self._add_syntax_error = add_syntax_error
+        # If set to a list, the names that are added are also appended to it.
+        self.recorded_names = None
 
     def is_async_funcdef(self):
         # Stupidly enough async funcdefs can have two different forms,
@@ -151,6 +161,8 @@ class _Context(object):
             # We are only interested in first level names.
             return
 
+        if self.recorded_names is not None:
+            self.recorded_names.append(name)
         if parent_type == 'global_stmt':
             self._global_names.append(name)
         elif parent_type == 'nonlocal_stmt':
@@ -252,11 +264,73 @@ class _Context(object):
 class ErrorFinder(Normalizer):
     """
     Searches for errors in the syntax tree.
+
+    If a module has an issue cache (the modules of ``diff_cache=True`` have
+    one), the issues of its statements are cached there. The diff parser
+    keeps the cached issues of the statements that it copied unchanged, so
+    only the statements that it parsed are checked again.
     """
     def __init__(self, *args, **kwargs):
         super(ErrorFinder, self).__init__(*args, **kwargs)
         self._error_dict = {}
         self.version = self.grammar.version_info
+        self._recorded_issues = None
+        self._cacheable = True
+
+    def walk(self, node):
+        issue_cache = getattr(node, '_issue_cache', None)
+        if issue_cache is None:
+            return super(ErrorFinder, self).walk(node)
+
+        # The code is not generated in this case, it's not needed for the
+        # issues.
+        self.initialize(node)
+        node._issue_cache = self._visit_module(node, issue_cache)
+        self.finalize()
+
+    def _visit_module(self, module, issue_cache):
+        """
+        Visits the module like ``visit``, but uses the issues of the cached
+        statements instead of visiting them. Returns the new issue cache.
+        """
+        new_cache = {}
+        context = self.context
+        with self.visit_node(module):
+            for child in module.children:
+                cached = issue_cache.get(child)
+                if cached is not None and cached.version == self.version:
+                    # Do everything in the same order as if the statement was
+                    # visited, so the results are the same.
+                    for code, message, node in cached.issues:
+                        self.add_issue(node, code, message)
+                    for name in cached.names:
+                        context.add_name(name)
+                    context._nonlocal_names_in_subscopes += cached.nonlocal_names
+                else:
+                    cached = self._visit_statement(child)
+                    if cached is None:
+                        continue
+                new_cache[child] = cached
+        return new_cache
+
+    def _visit_statement(self, node):
+        context = self.context
+        nonlocal_count = len(context._nonlocal_names_in_subscopes)
+        self._cacheable = True
+        self._recorded_issues = issues = []
+        context.recorded_names = names = []
+        try:
+            self.visit(node)
+        finally:
+            self._recorded_issues = None
+            context.recorded_names = None
+
+        if not self._cacheable:
+            return None
+        return _CachedStatement(
+            self.version, issues, names,
+            context._nonlocal_names_in_subscopes[nonlocal_count:]
+        )
 
     def initialize(self, node):
         def create_context(node):
@@ -271,14 +345,16 @@ class ErrorFinder(Normalizer):
         self.context = create_context(node) or _Context(node, self._add_syntax_error)
         self._indentation_count = 0
 
-    def visit(self, node):
+    def _get_children_to_visit(self, node):
         if node.type == 'error_node':
-            with self.visit_node(node):
-                # Don't need to investigate the inners of an error node. We
-                # might find errors in there that should be ignored, because
-                # the error node itself already shows that there's an issue.
-                return ''
-        return super(ErrorFinder, self).visit(node)
+            # The issues of error nodes depend on the leaf after them, which
+            # might be in another statement.
+            self._cacheable = False
+            # Don't need to investigate the inners of an error node. We
+            # might find errors in there that should be ignored, because
+            # the error node itself already shows that there's an issue.
+            return []
+        return node.children
 
     @contextmanager
     def visit_node(self, node):
@@ -306,6 +382,7 @@ class ErrorFinder(Normalizer):
 
     def visit_leaf(self, leaf):
         if leaf.type == 'error_leaf':
+            self._cacheable = False
             if leaf.token_type in ('INDENT', 'ERROR_DEDENT'):
                 # Indents/Dedents itself never have a prefix. They are just
                 # "pseudo" tokens that get removed by the syntax tree later.
@@ -350,6 +427,8 @@ class ErrorFinder(Normalizer):
         line = node.start_pos[0]
         args = (code, message, node)
         self._error_dict.setdefault(line, args)
+        if self._recorded_issues is not None:
+            self._recorded_issues.append(args)
 
     def finalize(self):
         self.context.finalize()
@@ -604,6 +683,8 @@ class _FutureImportRule(SyntaxRule):
 
     def is_issue(self, node):
         if _is_future_import(node):
+            # This depends on the statements before it.
+            self._normalizer._cacheable = False
             if not _is_future_import_first(node):
                 return True
 
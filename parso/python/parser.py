@@ -1,3 +1,4 @@
+from parso._compatibility import intern, py_version
 from parso.python import tree
 from parso.python.token import PythonTokenTypes
 from parso.parser import BaseParser
@@ -6,6 +7,14 @@ from parso.parser import BaseParser
 NAME = PythonTokenTypes.NAME
 INDENT = PythonTokenTypes.INDENT
 DEDENT = PythonTokenTypes.DEDENT
+NEWLINE = PythonTokenTypes.NEWLINE
+ENDMARKER = PythonTokenTypes.ENDMARKER
+# The values of these leaves are typically unique, interning them is useless.
+_NOT_INTERNED = frozenset([
+    PythonTokenTypes.STRING,
+    PythonTokenTypes.FSTRING_STRING,
+    PythonTokenTypes.ERRORTOKEN,
+])
 
 
 class Parser(BaseParser):
@@ -14,6 +23,14 @@ class Parser(BaseParser):
     class structure of different scopes.
 
     :param pgen_grammar: The grammar object of pgen2. Loaded by load_grammar.
+    :param lazy_suite_parser: If given, the bodies of functions and classes
+        are not parsed, but stored as :class:`tree.LazySuite`. It is called
+        with the code of a body and its start position once the children of
+        the suite are needed and returns them.
+    :param compact: Uses less memory for the tree: The values of names and
+        numbers and the prefixes of leaves (without comments) are shared, so
+        e.g. all the ``self`` names of a module share one string. Children
+        lists don't have unused capacity.
     """
 
     node_map = {
@@ -64,10 +81,18 @@ class Parser(BaseParser):
         PythonTokenTypes.FSTRING_END: tree.FStringEnd,
     }
 
-    def __init__(self, pgen_grammar, error_recovery=True, start_nonterminal='file_input'):
+    def __init__(self, pgen_grammar, error_recovery=True, start_nonterminal='file_input',
+                 lazy_suite_parser=None, compact=False):
+        self._lazy_suite_parser = lazy_suite_parser
+        self._compact = compact
         super(Parser, self).__init__(pgen_grammar, start_nonterminal,
                                      error_recovery=error_recovery)
 
+    def reset(self):
+        super(Parser, self).reset()
+        # Python 2 can't intern unicode, the strings of compact trees are only
+        # shared within a tree there.
+        self._shared_strings = {} if self._compact and py_version < 30 else None
         self.syntax_errors = []
         self._omit_dedent_list = []
         self._indent_counter = 0
@@ -79,6 +104,9 @@ class Parser(BaseParser):
 
             tokens = self._recovery_tokenize(tokens)
 
+        if self._lazy_suite_parser is not None:
+            tokens = self._skip_bodies(tokens)
+
         return super(Parser, self).parse(tokens)
 
     def convert_node(self, nonterminal, children):
@@ -89,6 +117,9 @@ class Parser(BaseParser):
         grammar rule produces a new complete node, so that the tree is build
         strictly bottom-up.
         """
+        if self._compact:
+            # Lists that were appended to are overallocated, a copy is not.
+            children = list(children)
         try:
             node = self.node_map[nonterminal](children)
         except KeyError:
@@ -109,15 +140,33 @@ class Parser(BaseParser):
             c.parent = node
         return node
 
+    def _share(self, string):
+        if self._shared_strings is None:
+            return intern(string)
+        return self._shared_strings.setdefault(string, string)
+
     def convert_leaf(self, type, value, prefix, start_pos):
         # print('leaf', repr(value), token.tok_name[type])
+        if self._compact and '#' not in prefix:
+            prefix = self._share(prefix)
+
         if type == NAME:
             if value in self._pgen_grammar.reserved_syntax_strings:
-                return tree.Keyword(value, start_pos, prefix)
-            else:
-                return tree.Name(value, start_pos, prefix)
+                # Keywords and operators are interned: There are a lot of them
+                # and they share the value with the strings they are compared
+                # to (e.g. ``leaf == 'def'``), which makes comparing them cheap.
+                return tree.Keyword(intern(value), start_pos, prefix)
+            if self._compact:
+                value = self._share(value)
+            return tree.Name(value, start_pos, prefix)
 
-        return self._leaf_map.get(type, tree.Operator)(value, start_pos, prefix)
+        try:
+            leaf_class = self._leaf_map[type]
+        except KeyError:
+            return tree.Operator(intern(value), start_pos, prefix)
+        if self._compact and type not in _NOT_INTERNED:
+            value = self._share(value)
+        return leaf_class(value, start_pos, prefix)
 
     def error_recovery(self, token):
         tos_nodes = self.stack[-1].nodes
@@ -216,3 +265,69 @@ class Parser(BaseParser):
             elif typ == INDENT:
                 self._indent_counter += 1
             yield token
+
+    def _get_body_suite_plan(self):
+        """
+        Returns the plan of a NEWLINE that starts the suite of a function or
+        class or None if the NEWLINE does something else.
+        """
+        tos = self.stack[-1]
+        if tos.nonterminal not in ('funcdef', 'classdef'):
+            return None
+        plan = tos.dfa.transitions.get(NEWLINE)
+        if plan is None or not plan.dfa_pushes \
+                or plan.dfa_pushes[0].from_rule != 'suite':
+            return None
+        return plan
+
+    def _skip_bodies(self, tokens):
+        """
+        Instead of passing the tokens of a function or class body to the
+        parser, a LazySuite that contains the code of those tokens is added.
+        """
+        tokens = iter(tokens)
+        for token in tokens:
+            if token.type != NEWLINE:
+                yield token
+                continue
+
+            plan = self._get_body_suite_plan()
+            if plan is None:
+                yield token
+                continue
+
+            body = [token, next(tokens)]
+            if body[-1].type != INDENT:
+                # Not an indented block, let the parser deal with it.
+                for t in body:
+                    yield t
+                continue
+
+            indentation = 1
+            for body_token in tokens:
+                typ = body_token.type
+                if typ == INDENT:
+                    indentation += 1
+                elif typ == DEDENT:
+                    indentation -= 1
+                    if indentation == 0:
+                        break
+                elif typ == ENDMARKER:
+                    # The block was never closed (e.g. because error recovery
+                    # omitted a DEDENT), just parse it.
+                    for t in body:
+                        yield t
+                    yield body_token
+                    return
+                body.append(body_token)
+
+            tos = self.stack[-1]
+            code = ''.join(t.prefix + t.string for t in body)
+            suite = tree.LazySuite(
+                code,
+                code_start=tos.nodes[-1].end_pos,
+                prefix_length=len(token.prefix),
+                parse_suite=self._lazy_suite_parser,
+            )
+            tos.dfa = plan.next_dfa
+            tos.nodes.append(suite)
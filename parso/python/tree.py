@@ -43,6 +43,7 @@ Parser Tree Classes
 """
 
 import re
+from bisect import bisect_left
 try:
     from collections.abc import Mapping
 except ImportError:
@@ -50,10 +51,11 @@ except ImportError:
 
 from parso._compatibility import utf8_repr, unicode
 from parso.tree import Node, BaseNode, Leaf, ErrorNode, ErrorLeaf, \
-    search_ancestor
+    search_ancestor, iter_descendants
 from parso.python.prefix import split_prefix
 from parso.utils import split_lines
 
+_STRING_TYPES = (str, unicode)
 _FLOW_CONTAINERS = set(['if_stmt', 'while_stmt', 'for_stmt', 'try_stmt',
                         'with_stmt', 'async_stmt', 'suite'])
 _RETURN_STMT_CONTAINERS = set(['suite', 'simple_stmt']) | _FLOW_CONTAINERS
@@ -167,6 +169,77 @@ class PythonErrorLeaf(ErrorLeaf, PythonLeaf):
     __slots__ = ()
 
 
+class LazySuite(PythonNode):
+    """
+    The ``suite`` of a function or class that was not parsed, because
+    ``bodies='skip'`` was passed to :py:meth:`parso.Grammar.parse`. It only
+    keeps the code of the body and parses it as soon as its children are
+    accessed. Positions and :py:meth:`get_code` work without parsing.
+    """
+    __slots__ = ('_code', '_code_start', '_prefix_length', '_end_pos',
+                 '_parse_suite', '_children')
+
+    def __init__(self, code, code_start, prefix_length, parse_suite):
+        super(LazySuite, self).__init__('suite', None)
+        self._code = code
+        self._code_start = code_start
+        self._prefix_length = prefix_length
+        self._parse_suite = parse_suite
+
+        lines = split_lines(code)
+        if len(lines) == 1:
+            self._end_pos = code_start[0], code_start[1] + len(code)
+        else:
+            self._end_pos = code_start[0] + len(lines) - 1, len(lines[-1])
+
+    @property
+    def children(self):
+        if self._children is None:
+            children = self._parse_suite(self._code, self._code_start)
+            for child in children:
+                child.parent = self
+            self._children = children
+        return self._children
+
+    @children.setter
+    def children(self, children):
+        self._children = children
+
+    def is_parsed(self):
+        """
+        Returns ``True`` if the body has already been parsed.
+        """
+        return self._children is not None
+
+    @property
+    def start_pos(self):
+        if self._children is not None:
+            return self._children[0].start_pos
+        lines = split_lines(self._code[:self._prefix_length])
+        if len(lines) == 1:
+            return self._code_start[0], self._code_start[1] + len(lines[0])
+        return self._code_start[0] + len(lines) - 1, len(lines[-1])
+
+    @property
+    def end_pos(self):
+        if self._children is not None:
+            return self._children[-1].end_pos
+        return self._end_pos
+
+    def get_code(self, include_prefix=True):
+        if self._children is not None:
+            return super(LazySuite, self).get_code(include_prefix)
+        if include_prefix:
+            return self._code
+        return self._code[self._prefix_length:]
+
+    def __repr__(self):
+        if self._children is not None:
+            return super(LazySuite, self).__repr__()
+        return "<%s: @%s-%s>" % (type(self).__name__,
+                                 self.start_pos[0], self.end_pos[0])
+
+
 class EndMarker(_LeafWithoutNewlines):
     __slots__ = ()
     type = 'endmarker'
@@ -183,6 +256,13 @@ class Newline(PythonLeaf):
     __slots__ = ()
     type = 'newline'
 
+    @property
+    def end_pos(self):
+        if self.value:
+            # The value is a single \n, \r\n or \r.
+            return self.line + 1, 0
+        return super(Newline, self).end_pos
+
     @utf8_repr
     def __repr__(self):
         return "<%s: %s>" % (type(self).__name__, repr(self.value))
@@ -246,6 +326,32 @@ class Name(_LeafWithoutNewlines):
         return None
 
 
+class _LeafWithEndPosCache(PythonLeaf):
+    """
+    Leaves like strings can span a lot of lines. Splitting them every time
+    the end position is needed is slow. Therefore remember where they end
+    relative to their start, as long as the value doesn't change.
+    """
+    __slots__ = ('_end_pos_cache',)
+
+    @property
+    def end_pos(self):
+        value = self.value
+        try:
+            cached_value, line_offset, end_column = self._end_pos_cache
+        except AttributeError:
+            cached_value = None
+
+        if cached_value is not value:
+            if '\n' not in value and '\r' not in value:
+                return self.line, self.column + len(value)
+            lines = split_lines(value)
+            line_offset = len(lines) - 1
+            end_column = len(lines[-1])
+            self._end_pos_cache = value, line_offset, end_column
+        return self.line + line_offset, end_column
+
+
 class Literal(PythonLeaf):
     __slots__ = ()
 
@@ -255,7 +361,7 @@ class Number(Literal):
     __slots__ = ()
 
 
-class String(Literal):
+class String(_LeafWithEndPosCache, Literal):
     type = 'string'
     __slots__ = ()
 
@@ -272,7 +378,7 @@ class String(Literal):
         return match.group(2)[:-len(match.group(1))]
 
 
-class FStringString(PythonLeaf):
+class FStringString(_LeafWithEndPosCache):
     """
     f-strings contain f-string expressions and normal python strings. These are
     the string parts of f-strings.
@@ -300,12 +406,14 @@ class FStringEnd(PythonLeaf):
 
 
 class _StringComparisonMixin(object):
+    __slots__ = ()
+
     def __eq__(self, other):
         """
         Make comparisons with strings easy.
         Improves the readability of the parser.
         """
-        if isinstance(other, (str, unicode)):
+        if isinstance(other, _STRING_TYPES):
             return self.value == other
 
         return self is other
@@ -358,15 +466,11 @@ class Scope(PythonBaseNode, DocstringMixin):
         return self._search_in_scope('import_name', 'import_from')
 
     def _search_in_scope(self, *names):
-        def scan(children):
-            for element in children:
-                if element.type in names:
-                    yield element
-                if element.type in _FUNC_CONTAINERS:
-                    for e in scan(element.children):
-                        yield e
-
-        return scan(self.children)
+        return (
+            node
+            for node in iter_descendants(self, _FUNC_CONTAINERS)
+            if node.type in names
+        )
 
     def get_suite(self):
         """
@@ -390,12 +494,16 @@ class Module(Scope):
     Depending on the underlying parser this may be a full module or just a part
     of a module.
     """
-    __slots__ = ('_used_names',)
+    __slots__ = ('_used_names', '_leaf_positions', '_type_index', '_issue_cache')
     type = 'file_input'
 
     def __init__(self, children):
         super(Module, self).__init__(children)
         self._used_names = None
+        self._leaf_positions = None
+        self._type_index = None
+        # Used by the error finder, see parso.python.errors.ErrorFinder.
+        self._issue_cache = None
 
     def _iter_future_import_names(self):
         """
@@ -425,29 +533,103 @@ class Module(Scope):
                 return True
         return False
 
+    def get_leaf_for_position(self, position, include_prefixes=False):
+        # Binary searching through the tree calculates the end positions of a
+        # lot of nodes and leaves. Therefore the end positions of all leaves
+        # are indexed the first time this is called.
+        if self._leaf_positions is None:
+            self._leaf_positions = _create_leaf_positions(self)
+        end_positions, leaves = self._leaf_positions
+
+        if not ((1, 0) <= position <= end_positions[-1]):
+            raise ValueError('Please provide a position that exists within this node.')
+        leaf = leaves[bisect_left(end_positions, position)]
+        if isinstance(leaf, LazySuite):
+            return leaf.get_leaf_for_position(position, include_prefixes)
+        if not include_prefixes and position < leaf.start_pos:
+            # We're on a prefix.
+            return None
+        return leaf
+
     def get_used_names(self):
         """
         Returns all the :class:`Name` leafs that exist in this module. This
         includes both definitions and references of names.
         """
         if self._used_names is None:
-            # Don't directly use self._used_names to eliminate a lookup.
-            dct = {}
+            self._used_names = UsedNamesMapping(_create_used_names(self))
+        return self._used_names
 
-            def recurse(node):
-                try:
-                    children = node.children
-                except AttributeError:
-                    if node.type == 'name':
-                        arr = dct.setdefault(node.value, [])
-                        arr.append(node)
-                else:
-                    for child in children:
-                        recurse(child)
+    def iter_nodes(self, *node_types):
+        """
+        Returns a generator of all the nodes and leaves in this module (in the
+        order of the tree) that have one of the given types, e.g.
+        ``module.iter_nodes('import_name', 'import_from')``.
+
+        The first call creates an index of all nodes and leaves by type, which
+        is kept up to date by the diff parser.
+        """
+        if self._type_index is None:
+            self._type_index = _create_type_index(self)
+
+        if len(node_types) == 1:
+            return iter(self._type_index.get(node_types[0], ()))
+
+        nodes = [
+            node
+            for node_type in set(node_types)
+            for node in self._type_index.get(node_type, ())
+        ]
+        # Nodes that start at the same position are nested, the outer nodes
+        # come first.
+        nodes.sort(key=lambda node: (node.start_pos, _get_depth(node)))
+        return iter(nodes)
 
-            recurse(self)
-            self._used_names = UsedNamesMapping(dct)
-        return self._used_names
+
+def _get_depth(node):
+    depth = 0
+    while node.parent is not None:
+        node = node.parent
+        depth += 1
+    return depth
+
+
+def _create_type_index(module):
+    dct = {}
+    for node in iter_descendants(module):
+        dct.setdefault(node.type, []).append(node)
+    return dct
+
+
+def _create_used_names(node):
+    dct = {}
+    for leaf in iter_descendants(node):
+        if leaf.type == 'name':
+            dct.setdefault(leaf.value, []).append(leaf)
+    return dct
+
+
+def _create_leaf_positions(module):
+    """
+    Returns the end positions of all leaves and the leaves themselves. Bodies
+    that were not parsed yet (:class:`LazySuite`) are not parsed, they are
+    used like a leaf.
+    """
+    end_positions = []
+    leaves = []
+    stack = [module]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, LazySuite) and not node.is_parsed():
+            children = None
+        else:
+            children = getattr(node, 'children', None)
+        if children is None:
+            end_positions.append(node.end_pos)
+            leaves.append(node)
+        else:
+            stack.extend(reversed(children))
+    return end_positions, leaves
 
 
 class Decorator(PythonBaseNode):
@@ -601,8 +783,10 @@ class Function(ClassOrFunc):
         """
         Returns a generator of `yield_expr`.
         """
-        def scan(children):
-            for element in children:
+        def scan():
+            stack = self.children[::-1]
+            while stack:
+                element = stack.pop()
                 if element.type in ('classdef', 'funcdef', 'lambdef'):
                     continue
 
@@ -615,40 +799,31 @@ class Function(ClassOrFunc):
                         else:
                             yield element
                 else:
-                    for result in scan(nested_children):
-                        yield result
+                    stack += nested_children[::-1]
 
-        return scan(self.children)
+        return scan()
 
     def iter_return_stmts(self):
         """
         Returns a generator of `return_stmt`.
         """
-        def scan(children):
-            for element in children:
-                if element.type == 'return_stmt' \
-                        or element.type == 'keyword' and element.value == 'return':
-                    yield element
-                if element.type in _RETURN_STMT_CONTAINERS:
-                    for e in scan(element.children):
-                        yield e
-
-        return scan(self.children)
+        return (
+            element
+            for element in iter_descendants(self, _RETURN_STMT_CONTAINERS)
+            if element.type == 'return_stmt'
+            or element.type == 'keyword' and element.value == 'return'
+        )
 
     def iter_raise_stmts(self):
         """
         Returns a generator of `raise_stmt`. Includes raise statements inside try-except blocks
         """
-        def scan(children):
-            for element in children:
-                if element.type == 'raise_stmt' \
-                        or element.type == 'keyword' and element.value == 'raise':
-                    yield element
-                if element.type in _RETURN_STMT_CONTAINERS:
-                    for e in scan(element.children):
-                        yield e
-
-        return scan(self.children)
+        return (
+            element
+            for element in iter_descendants(self, _RETURN_STMT_CONTAINERS)
+            if element.type == 'raise_stmt'
+            or element.type == 'keyword' and element.value == 'raise'
+        )
 
     def is_generator(self):
         """
@@ -19,6 +19,54 @@ def search_ancestor(node, *node_types):
             return node
 
 
+def iter_descendants(node, descend_types=None):
+    """
+    Returns a generator of all nodes and leaves below ``node`` (not including
+    ``node`` itself) in the order of the tree, parents before their children.
+    Uses a stack instead of recursion, so deeply nested trees don't hit the
+    recursion limit.
+
+    :param node: A :py:class:`BaseNode`.
+    :param descend_types: If given, only the children of nodes with these
+        types are visited.
+    :type descend_types: set of str
+    """
+    stack = node.children[::-1]
+    pop = stack.pop
+    if descend_types is None:
+        while stack:
+            node = pop()
+            yield node
+            if isinstance(node, BaseNode):
+                stack += node.children[::-1]
+    else:
+        while stack:
+            node = pop()
+            yield node
+            if node.type in descend_types:
+                stack += node.children[::-1]
+
+
+_LEAF_CODE = 'leaf'
+_NODE_CODE = 'node'
+_CUSTOM_CODE = 'custom'
+_code_kinds = {}
+
+
+def _get_function(method):
+    # Python 2 returns unbound methods for functions on classes.
+    return getattr(method, '__func__', method)
+
+
+def _get_code_kind(cls):
+    get_code = _get_function(cls.get_code)
+    if get_code is _get_function(Leaf.get_code):
+        return _LEAF_CODE
+    if get_code is _get_function(BaseNode.get_code):
+        return _NODE_CODE
+    return _CUSTOM_CODE
+
+
 class NodeOrLeaf(object):
     """
     The base class for nodes and leaves.
@@ -39,18 +87,39 @@ class NodeOrLeaf(object):
             scope = scope.parent
         return scope
 
+    def _get_index_in_parent(self):
+        """
+        Returns the index of this node in the children of its parent. The index
+        is remembered, but only used if it is still correct, because children
+        can be changed (e.g. by the diff parser).
+        """
+        children = self.parent.children
+        try:
+            i = self._index_in_parent
+            if children[i] is self:
+                return i
+        except (AttributeError, IndexError):
+            pass
+
+        # Remember the index of all siblings, so that walking through the
+        # children is linear and not quadratic.
+        for i, child in enumerate(children):
+            child._index_in_parent = i
+        i = self._index_in_parent
+        if i >= len(children) or children[i] is not self:
+            raise ValueError('%r is not in the children of its parent' % self)
+        return i
+
     def get_next_sibling(self):
         """
         Returns the node immediately following this node in this parent's
         children list. If this node does not have a next sibling, it is None
         """
-        # Can't use index(); we need to test by identity
-        for i, child in enumerate(self.parent.children):
-            if child is self:
-                try:
-                    return self.parent.children[i + 1]
-                except IndexError:
-                    return None
+        i = self._get_index_in_parent() + 1
+        children = self.parent.children
+        if i == len(children):
+            return None
+        return children[i]
 
     def get_previous_sibling(self):
         """
@@ -58,12 +127,10 @@ class NodeOrLeaf(object):
         children list. If this node does not have a previous sibling, it is
         None.
         """
-        # Can't use index(); we need to test by identity
-        for i, child in enumerate(self.parent.children):
-            if child is self:
-                if i == 0:
-                    return None
-                return self.parent.children[i - 1]
+        i = self._get_index_in_parent()
+        if i == 0:
+            return None
+        return self.parent.children[i - 1]
 
     def get_previous_leaf(self):
         """
@@ -72,14 +139,13 @@ class NodeOrLeaf(object):
         """
         node = self
         while True:
-            c = node.parent.children
-            i = c.index(node)
+            i = node._get_index_in_parent()
             if i == 0:
                 node = node.parent
                 if node.parent is None:
                     return None
             else:
-                node = c[i - 1]
+                node = node.parent.children[i - 1]
                 break
 
         while True:
@@ -96,7 +162,7 @@ class NodeOrLeaf(object):
         node = self
         while True:
             c = node.parent.children
-            i = c.index(node)
+            i = node._get_index_in_parent()
             if i == len(c) - 1:
                 node = node.parent
                 if node.parent is None:
@@ -165,7 +231,7 @@ class Leaf(NodeOrLeaf):
     Leafs are basically tokens with a better API. Leafs exactly know where they
     were defined and what text preceeds them.
     '''
-    __slots__ = ('value', 'parent', 'line', 'column', 'prefix')
+    __slots__ = ('value', 'parent', 'line', 'column', 'prefix', '_index_in_parent')
 
     def __init__(self, value, start_pos, prefix=''):
         self.value = value
@@ -214,14 +280,12 @@ class Leaf(NodeOrLeaf):
 
     @property
     def end_pos(self):
-        lines = split_lines(self.value)
-        end_pos_line = self.line + len(lines) - 1
-        # Check for multiline token
-        if self.line == end_pos_line:
-            end_pos_column = self.column + len(lines[-1])
-        else:
-            end_pos_column = len(lines[-1])
-        return end_pos_line, end_pos_column
+        value = self.value
+        if '\n' not in value and '\r' not in value:
+            # Most leaves don't contain newlines, no need to split them.
+            return self.line, self.column + len(value)
+        lines = split_lines(value)
+        return self.line + len(lines) - 1, len(lines[-1])
 
     @utf8_repr
     def __repr__(self):
@@ -244,7 +308,7 @@ class BaseNode(NodeOrLeaf):
     The super class for all nodes.
     A node has children, a type and possibly a parent node.
     """
-    __slots__ = ('children', 'parent')
+    __slots__ = ('children', 'parent', '_index_in_parent')
     type = None
 
     def __init__(self, children):
@@ -270,11 +334,33 @@ class BaseNode(NodeOrLeaf):
         return self.children[-1].end_pos
 
     def _get_code_for_children(self, children, include_prefix):
-        if include_prefix:
-            return "".join(c.get_code() for c in children)
-        else:
-            first = children[0].get_code(include_prefix=False)
-            return first + "".join(c.get_code() for c in children[1:])
+        # Walks the tree with a stack instead of recursing into every node and
+        # joins all the strings once. Nodes and leaves that overwrite get_code
+        # (e.g. lazy suites) are asked for their code.
+        parts = []
+        append = parts.append
+        stack = children[::-1]
+        pop = stack.pop
+        while stack:
+            node = pop()
+            cls = node.__class__
+            try:
+                kind = _code_kinds[cls]
+            except KeyError:
+                kind = _code_kinds[cls] = _get_code_kind(cls)
+
+            if kind is _NODE_CODE:
+                stack.extend(node.children[::-1])
+                # The prefix of the first leaf is not yet used.
+                continue
+            if kind is _LEAF_CODE:
+                if include_prefix:
+                    append(node.prefix)
+                append(node.value)
+            else:
+                append(node.get_code(include_prefix))
+            include_prefix = True
+        return ''.join(parts)
 
     def get_code(self, include_prefix=True):
         return self._get_code_for_children(self.children, include_prefix)
@@ -0,0 +1,423 @@
+#!/usr/bin/env python
+"""
+Benchmarks for parso. All timings are the best of a few repeats.
+
+snippets: Parses a lot of tiny snippets (like notebook cells or code in
+strings). Compares reusing the parsers of a grammar with creating a new
+parser for every snippet.
+
+threads: Parses Python files from multiple threads at the same time (with the
+same grammar). On a Python with a GIL, this only shows the locking overhead,
+on free-threaded builds the parses actually run in parallel.
+
+leaves: Walks through all leaves (forwards and backwards) and siblings of
+modules with a lot of children in a node (a long list and a lot of top level
+statements), which used to be quadratic.
+
+memory: Measures the memory of the trees of Python files (with tracemalloc,
+therefore Python 3.4+), with and without compact=True.
+
+get_code: Generates the code of whole modules and of all statements of Python
+files.
+
+walkers: Runs the tree walkers (used names, type index, scope search, error
+finder and the graph check of the diff parser) on a wide and on a deeply
+nested module.
+
+update: Changes one line in the middle of files of different sizes (made from
+the given files) and measures the diff parser, with the new code and with
+Grammar.apply_edits. The opcodes of difflib are only timed for comparison.
+Also changes a lot of lines at the start of the files, which needs a lot of
+small parser runs, and inserts a line at the top, which moves all leaves
+(this is O(file), positions are absolute).
+
+query: Searches nodes of some types in Python files, with a recursive walk and
+with Module.iter_nodes (the first call builds the type index).
+
+Usage:
+  benchmark.py snippets [-v=<version>] [-n=<nr>] [-r=<nr>]
+  benchmark.py threads [-v=<version>] [-t=<nr>] [-r=<nr>] [--diff-cache] <file>...
+  benchmark.py leaves [-v=<version>] [-w=<nr>] [-r=<nr>]
+  benchmark.py memory [-v=<version>] <file>...
+  benchmark.py get_code [-v=<version>] [-r=<nr>] <file>...
+  benchmark.py query [-v=<version>] [-r=<nr>] <file>...
+  benchmark.py walkers [-v=<version>] [-w=<nr>] [-d=<nr>] [-r=<nr>]
+  benchmark.py update [-v=<version>] [-r=<nr>] <file>...
+  benchmark.py -h | --help
+
+Options:
+  -h --help          Show this screen.
+  -v <version>       The Python grammar version, defaults to the current one.
+  -n <nr>            Number of parses per repeat [default: 10000].
+  -r <nr>            Number of repeats [default: 3].
+  -t <nr>            Number of threads [default: 4].
+  -w <nr>            Width of the wide nodes [default: 5000].
+  -d <nr>            Depth of the deeply nested statements [default: 300].
+  --diff-cache       Parse with diff_cache=True, every file is parsed by all
+                     threads.
+"""
+from __future__ import print_function
+
+import threading
+from timeit import default_timer
+
+from docopt import docopt
+
+import parso
+from parso.cache import parser_cache
+from parso.utils import python_bytes_to_unicode, split_lines
+
+SNIPPETS = (
+    'x = 1\n',
+    'foo.bar(baz, 3)\n',
+    'import os\n',
+    '[i ** 2 for i in range(10) if i]\n',
+    'def f(a, b=2):\n    return a + b\n',
+    'lambda x: x.strip()',
+    'class A(B):\n    pass\n',
+    'if x:\n    y()\nelse:\n    z()\n',
+)
+
+
+def best_of(repeats, func):
+    times = []
+    for _ in range(repeats):
+        start = default_timer()
+        func()
+        times.append(default_timer() - start)
+    return min(times)
+
+
+def print_timing(name, seconds, count):
+    print('%-30s %8.3fs %10.0f/s' % (name, seconds, count / seconds))
+
+
+def snippets(grammar, count, repeats):
+    snippets = [SNIPPETS[i % len(SNIPPETS)] for i in range(count)]
+
+    def pooled():
+        for snippet in snippets:
+            grammar.parse(snippet)
+
+    def new_parser():
+        for snippet in snippets:
+            grammar._parser_pool.parsers.clear()
+            grammar.parse(snippet)
+
+    print_timing('new parser per snippet', best_of(repeats, new_parser), count)
+    print_timing('reused parsers', best_of(repeats, pooled), count)
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return python_bytes_to_unicode(f.read())
+
+
+def _in_threads(thread_count, func):
+    threads = [threading.Thread(target=func, args=(i,)) for i in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def threads(grammar, paths, thread_count, repeats, diff_cache):
+    codes = [(path, _read(path)) for path in paths]
+    count = len(codes) * thread_count
+
+    def parse_all(thread_index):
+        for path, code in codes:
+            if diff_cache:
+                # Change the code a bit so the diff parser has some work.
+                grammar.parse(code + '\n#%s\n' % thread_index, path=path,
+                              diff_cache=True)
+            else:
+                grammar.parse(code)
+
+    def sequential():
+        parser_cache.clear()
+        for i in range(thread_count):
+            parse_all(i)
+
+    def parallel():
+        parser_cache.clear()
+        _in_threads(thread_count, parse_all)
+
+    print_timing('1 thread', best_of(repeats, sequential), count)
+    print_timing('%s threads' % thread_count, best_of(repeats, parallel), count)
+
+
+def _wide_module(width):
+    return (
+        'x = [\n' + ''.join('    %s,\n' % i for i in range(width)) + ']\n'
+        + ''.join('a%s = b + c(d)\n' % i for i in range(width))
+    )
+
+
+def leaves(grammar, width, repeats):
+    module = grammar.parse(_wide_module(width))
+    leaf_count = len(list(_iter_leaves(module)))
+
+    def forwards():
+        leaf = module.get_first_leaf()
+        while leaf is not None:
+            leaf = leaf.get_next_leaf()
+
+    def backwards():
+        leaf = module.get_last_leaf()
+        while leaf is not None:
+            leaf = leaf.get_previous_leaf()
+
+    def siblings():
+        for leaf in _iter_leaves(module):
+            leaf.get_next_sibling()
+            leaf.get_previous_sibling()
+
+    print_timing('get_next_leaf', best_of(repeats, forwards), leaf_count)
+    print_timing('get_previous_leaf', best_of(repeats, backwards), leaf_count)
+    print_timing('siblings', best_of(repeats, siblings), leaf_count)
+    print_timing('pep8 normalizer', best_of(
+        repeats, lambda: grammar._get_normalizer_issues(module)), leaf_count)
+
+
+def _deep_module(width, depth):
+    return ''.join(
+        'def f%s():\n    return %s-a%s%s\n' % (i, '(' * depth, i, ')' * depth)
+        for i in range(width // depth)
+    )
+
+
+def walkers(grammar, width, depth, repeats):
+    from parso.python.diff import _assert_valid_graph
+
+    for name, code in [('wide', _wide_module(width)),
+                       ('deep', _deep_module(width, depth))]:
+        module = grammar.parse(code)
+        count = len(list(_iter_leaves(module)))
+
+        def used_names():
+            module._used_names = None
+            module.get_used_names()
+
+        def type_index():
+            module._type_index = None
+            module.iter_nodes()
+
+        print(name)
+        print_timing('  get_used_names', best_of(repeats, used_names), count)
+        print_timing('  type index', best_of(repeats, type_index), count)
+        print_timing('  iter_funcdefs', best_of(
+            repeats, lambda: list(module.iter_funcdefs())), count)
+        print_timing('  iter_errors', best_of(
+            repeats, lambda: list(grammar.iter_errors(module))), count)
+        print_timing('  _assert_valid_graph', best_of(
+            repeats, lambda: _assert_valid_graph(module)), count)
+
+
+def _iter_leaves(node):
+    try:
+        children = node.children
+    except AttributeError:
+        yield node
+    else:
+        for child in children:
+            for leaf in _iter_leaves(child):
+                yield leaf
+
+
+def _count_leaves(node):
+    count = 0
+    leaf = node.get_first_leaf()
+    while leaf is not None:
+        count += 1
+        leaf = leaf.get_next_leaf()
+    return count
+
+
+def memory(grammar, paths):
+    import gc
+    import tracemalloc
+
+    codes = [_read(path) for path in paths]
+    for compact in (False, True):
+        gc.collect()
+        tracemalloc.start()
+        start = default_timer()
+        modules = [grammar.parse(code, compact=compact) for code in codes]
+        seconds = default_timer() - start
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        leaf_count = sum(_count_leaves(module) for module in modules)
+        print('compact=%-6s %8.1f MB %6.0f bytes/leaf   parsed in %.3fs' % (
+            compact, size / 1e6, size / float(leaf_count), seconds))
+        del modules
+
+
+def get_code(grammar, paths, repeats):
+    modules = [grammar.parse(_read(path)) for path in paths]
+    statements = [
+        node
+        for module in modules
+        for node in module.iter_funcdefs()
+    ] + [
+        child
+        for module in modules
+        for child in module.children
+    ]
+
+    def modules_code():
+        for module in modules:
+            module.get_code()
+
+    def statements_code():
+        for node in statements:
+            node.get_code(include_prefix=False)
+
+    print_timing('modules', best_of(repeats, modules_code), len(modules))
+    print_timing('statements', best_of(repeats, statements_code), len(statements))
+
+
+QUERIES = (
+    ('funcdef',),
+    ('import_name', 'import_from'),
+    ('atom_expr',),
+)
+
+
+def _walk_types(node, node_types):
+    for child in node.children:
+        if child.type in node_types:
+            yield child
+        try:
+            child.children
+        except AttributeError:
+            pass
+        else:
+            for n in _walk_types(child, node_types):
+                yield n
+
+
+def query(grammar, paths, repeats):
+    modules = [grammar.parse(_read(path)) for path in paths]
+
+    def build_index():
+        for module in modules:
+            module._type_index = None
+            module.iter_nodes()
+
+    def walk(node_types):
+        for module in modules:
+            list(_walk_types(module, node_types))
+
+    def indexed(node_types):
+        for module in modules:
+            list(module.iter_nodes(*node_types))
+
+    print_timing('build index', best_of(repeats, build_index), len(modules))
+    for node_types in QUERIES:
+        name = ' '.join(node_types)
+        print_timing('walk ' + name, best_of(repeats, lambda: walk(node_types)),
+                     len(modules))
+        print_timing('index ' + name, best_of(repeats, lambda: indexed(node_types)),
+                     len(modules))
+
+
+UPDATE_SIZES = (1000, 5000, 10000, 20000)
+
+
+EDIT = '  # edited'
+
+
+def _edit_line(lines, index):
+    """
+    Adds a comment to the first line that can have one and returns its
+    position.
+    """
+    while lines[index].endswith('\\\n') or not lines[index].strip():
+        index += 1
+    lines[index] = lines[index][:-1] + EDIT + '\n'
+    return index + 1, len(lines[index]) - len(EDIT) - 1
+
+
+def _time_update(grammar, code, old_lines, new_lines, repeats, copy=False):
+    from parso.python.diff import DiffParser
+
+    times = []
+    for _ in range(repeats):
+        module = grammar.parse(code)
+        differ = DiffParser(grammar._pgen_grammar, grammar._tokenizer, module)
+        start = default_timer()
+        differ.update(old_lines, new_lines, copy=copy)
+        times.append(default_timer() - start)
+    return min(times), differ.stats.parser_runs
+
+
+def update(grammar, paths, repeats):
+    import difflib
+    from parso.line_diff import get_opcodes
+
+    lines = split_lines(''.join(_read(path) for path in paths), keepends=True)
+    for size in UPDATE_SIZES:
+        code = ''.join((lines * (size // len(lines) + 1))[:size])
+        old_lines = split_lines(code, keepends=True)
+        new_lines = list(old_lines)
+        position = _edit_line(new_lines, size // 2)
+
+        edit_times = []
+        for _ in range(repeats):
+            parser_cache.clear()
+            grammar.parse(code, path='/benchmark.py', diff_cache=True)
+            start = default_timer()
+            grammar.apply_edits('/benchmark.py', [(position, position, EDIT)])
+            edit_times.append(default_timer() - start)
+
+        print('%s lines' % size)
+        print_timing('  difflib opcodes', best_of(
+            repeats,
+            lambda: difflib.SequenceMatcher(None, old_lines, new_lines).get_opcodes()
+        ), 1)
+        print_timing('  line_diff opcodes', best_of(
+            repeats, lambda: get_opcodes(old_lines, new_lines)), 1)
+        print_timing('  update', _time_update(
+            grammar, code, old_lines, new_lines, repeats)[0], 1)
+        print_timing('  update a copy', _time_update(
+            grammar, code, old_lines, new_lines, repeats, copy=True)[0], 1)
+        print_timing('  apply_edits', min(edit_times), 1)
+
+        start_lines = list(old_lines)
+        for index in range(0, min(size // 2, 2000), 4):
+            _edit_line(start_lines, index)
+        seconds, parser_count = _time_update(
+            grammar, code, old_lines, start_lines, repeats)
+        print_timing('  update at the start', seconds, 1)
+        print('  (%s parser runs)' % parser_count)
+
+        print_timing('  insert at the top', _time_update(
+            grammar, code, old_lines, ['import os\n'] + old_lines, repeats)[0], 1)
+
+
+def main(args):
+    grammar = parso.load_grammar(version=args['-v'])
+    repeats = int(args['-r'])
+    if args['snippets']:
+        snippets(grammar, int(args['-n']), repeats)
+    elif args['leaves']:
+        leaves(grammar, int(args['-w']), repeats)
+    elif args['walkers']:
+        walkers(grammar, int(args['-w']), int(args['-d']), repeats)
+    elif args['update']:
+        update(grammar, args['<file>'], repeats)
+    elif args['query']:
+        query(grammar, args['<file>'], repeats)
+    elif args['get_code']:
+        get_code(grammar, args['<file>'], repeats)
+    elif args['memory']:
+        memory(grammar, args['<file>'])
+    elif args['threads']:
+        threads(grammar, args['<file>'], int(args['-t']), repeats,
+                args['--diff-cache'])
+
+
+if __name__ == '__main__':
+    main(docopt(__doc__))
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+"""
+Benchmarks the diff parser with edits like the ones of an editor. Edit scripts
+are generated randomly (but reproducibly with a seed) for Python files.
+Directories are searched for ``*.py`` files. Every step of a script is parsed
+with ``diff_cache=True`` (the update) and without a cache (the full parse) and
+the percentiles of the latencies are reported per kind of edit script:
+
+typing: Opens a new line after a line and types a statement, one character
+per step.
+
+deletion: Deletes characters at the end of a line, one per step.
+
+paste: Inserts some lines that are copied from somewhere else in the file.
+
+indent: Indents some lines and dedents them again.
+
+With --save, the report is written as JSON. It can be compared with a later
+run (e.g. after a change to the diff parser) with --baseline. Use the same
+seed and files for that.
+
+Usage:
+  diff_benchmark.py [-v=<version>] [-s=<seed>] [-n=<nr>] [-r=<nr>]
+                    [-k=<kinds>] [--apply-edits] [--json] [--save=<file>]
+                    [--baseline=<file>] <path>...
+  diff_benchmark.py -h | --help
+
+Options:
+  -h --help          Show this screen.
+  -v <version>       The Python grammar version, defaults to the current one.
+  -s <seed>          The seed of the edit scripts [default: 0].
+  -n <nr>            Edit scripts per kind and file [default: 5].
+  -r <nr>            Runs of every edit script, the fastest time of every
+                     step is used [default: 1].
+  -k <kinds>         The kinds of edit scripts, separated by commas
+                     [default: typing,deletion,paste,indent].
+  --apply-edits      Update with Grammar.apply_edits instead of diffing the
+                     code.
+  --json             Print the report as JSON.
+  --save=<file>      Save the report as JSON.
+  --baseline=<file>  Compare with a report that was saved with --save.
+"""
+from __future__ import print_function
+
+import json
+import math
+import os
+import random
+from timeit import default_timer
+
+from docopt import docopt
+
+import parso
+from parso.cache import parser_cache
+from parso.grammar import _edit_lines
+from parso.python.diff import DiffStats
+from parso.utils import split_lines, python_bytes_to_unicode
+
+PATH = '/diff_benchmark.py'
+PERCENTILES = (50, 90, 99)
+STATEMENTS = (
+    'result = self.method(argument, key=value)',
+    'if node is not None and node.type == "name":',
+    'for i, name in enumerate(names):',
+    'return [n.value for n in nodes if n.parent is None]',
+    "print('%s: %s' % (key, value))",
+)
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return python_bytes_to_unicode(f.read())
+
+
+def _iter_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if filename.endswith('.py'):
+                        yield os.path.join(root, filename)
+        else:
+            yield path
+
+
+def _get_code_line(rng, lines):
+    """
+    Returns the index of a random line that contains code (not only
+    whitespace or a backslash at the end).
+    """
+    indexes = [i for i, line in enumerate(lines)
+               if line.strip() and not line.rstrip('\r\n').endswith('\\')]
+    return rng.choice(indexes)
+
+
+def _get_line_length(line):
+    return len(line.rstrip('\r\n'))
+
+
+def typing(rng, lines):
+    index = _get_code_line(rng, lines)
+    line = lines[index]
+    indentation = line[:len(line) - len(line.lstrip())]
+    if line.rstrip().endswith(':'):
+        indentation += '    '
+    statement = rng.choice(STATEMENTS)
+
+    end = index + 1, _get_line_length(line)
+    steps = [[(end, end, '\n' + indentation)]]
+    for column, character in enumerate(statement, len(indentation)):
+        position = index + 2, column
+        steps.append([(position, position, character)])
+    return steps
+
+
+def deletion(rng, lines):
+    index = _get_code_line(rng, lines)
+    line = lines[index]
+    length = _get_line_length(line)
+    count = min(rng.randint(5, 20), len(line.strip()))
+    return [
+        [((index + 1, column - 1), (index + 1, column), '')]
+        for column in range(length, length - count, -1)
+    ]
+
+
+def paste(rng, lines):
+    # The last line is usually empty (after the last newline).
+    line_count = len(lines) - 1
+    size = rng.randint(5, 30)
+    start = rng.randint(0, max(0, line_count - size))
+    text = ''.join(lines[start:start + size])
+    if not text.endswith('\n'):
+        text += '\n'
+    position = rng.randint(1, line_count), 0
+    return [[(position, position, text)]]
+
+
+def indent(rng, lines):
+    line_count = len(lines) - 1
+    size = rng.randint(3, 20)
+    start = rng.randint(1, max(1, line_count - size))
+    line_numbers = range(start, min(start + size, line_count + 1))
+    return [
+        [((line, 0), (line, 0), '    ') for line in line_numbers],
+        [((line, 0), (line, 4), '') for line in line_numbers],
+    ]
+
+
+KINDS = dict(typing=typing, deletion=deletion, paste=paste, indent=indent)
+
+
+def _run_script(grammar, code, steps, runs, apply_edits, stats):
+    """
+    Returns the fastest update and full parse times of every step.
+    """
+    versions = []
+    lines = split_lines(code, keepends=True)
+    for edits in steps:
+        lines, _ = _edit_lines(lines, edits)
+        versions.append(''.join(lines))
+
+    update_times = [float('inf')] * len(steps)
+    full_times = [float('inf')] * len(steps)
+    for run in range(runs):
+        parser_cache.clear()
+        grammar.parse(code, path=PATH, diff_cache=True)
+        run_stats = DiffStats()
+        for i, (edits, new_code) in enumerate(zip(steps, versions)):
+            start = default_timer()
+            if apply_edits:
+                grammar.apply_edits(PATH, edits, diff_stats=run_stats)
+            else:
+                grammar.parse(new_code, path=PATH, diff_cache=True,
+                              diff_stats=run_stats)
+            update_times[i] = min(update_times[i], default_timer() - start)
+
+            start = default_timer()
+            grammar.parse(new_code)
+            full_times[i] = min(full_times[i], default_timer() - start)
+        if not run:
+            stats.merge(run_stats)
+    return update_times, full_times
+
+
+def _get_percentile(sorted_times, percent):
+    # The nearest rank.
+    index = int(math.ceil(percent / 100.0 * len(sorted_times))) - 1
+    return sorted_times[max(index, 0)]
+
+
+def _get_latencies(times):
+    times = sorted(times)
+    latencies = dict(
+        ('p%s' % percent, _get_percentile(times, percent))
+        for percent in PERCENTILES
+    )
+    latencies['max'] = times[-1]
+    latencies['mean'] = sum(times) / len(times)
+    return latencies
+
+
+def benchmark(grammar, paths, kinds, seed, scripts, runs, apply_edits):
+    rng = random.Random(seed)
+    results = dict((kind, ([], [], DiffStats())) for kind in kinds)
+    files = 0
+    for path in _iter_files(paths):
+        code = _read(path)
+        lines = split_lines(code, keepends=True)
+        if len(lines) < 2 or not code.strip():
+            continue
+        files += 1
+        for kind in kinds:
+            update_times, full_times, stats = results[kind]
+            for _ in range(scripts):
+                steps = KINDS[kind](rng, lines)
+                updates, fulls = _run_script(grammar, code, steps, runs,
+                                             apply_edits, stats)
+                update_times += updates
+                full_times += fulls
+
+    report = dict(seed=seed, files=files, kinds={})
+    for kind, (update_times, full_times, stats) in results.items():
+        if not update_times:
+            continue
+        report['kinds'][kind] = dict(
+            steps=len(update_times),
+            update=_get_latencies(update_times),
+            full=_get_latencies(full_times),
+            full_parses=stats.full_parses,
+            parser_runs=stats.parser_runs,
+        )
+    return report
+
+
+def _format_delta(new, old):
+    if not old:
+        return '%8s' % ''
+    return '%+7.1f%%' % (100.0 * (new - old) / old)
+
+
+def print_report(report, baseline=None):
+    print('files: %s, seed: %s (times in ms)' % (report['files'], report['seed']))
+    names = ['p%s' % percent for percent in PERCENTILES] + ['max']
+    header = '%-10s %6s %8s' % ('', 'steps', 'reparses')
+    header += ''.join(' %8s' % ('upd ' + name) for name in names)
+    header += ''.join(' %8s' % ('full ' + name) for name in names)
+    header += ' %8s' % 'speedup'
+    if baseline is not None:
+        header += ' %8s %8s' % ('upd p50', 'upd p90')
+    print(header)
+
+    for kind, result in sorted(report['kinds'].items()):
+        update = result['update']
+        full = result['full']
+        line = '%-10s %6s %8s' % (kind, result['steps'], result['full_parses'])
+        line += ''.join(' %8.2f' % (update[name] * 1000) for name in names)
+        line += ''.join(' %8.2f' % (full[name] * 1000) for name in names)
+        line += ' %7.1fx' % (full['p50'] / update['p50'])
+        if baseline is not None:
+            old = baseline['kinds'].get(kind)
+            if old is None:
+                line += ' %8s %8s' % ('', '')
+            else:
+                line += ' ' + _format_delta(update['p50'], old['update']['p50'])
+                line += ' ' + _format_delta(update['p90'], old['update']['p90'])
+        print(line)
+
+
+def main(args):
+    grammar = parso.load_grammar(version=args['-v'])
+    kinds = args['-k'].split(',')
+    for kind in kinds:
+        if kind not in KINDS:
+            raise SystemExit('Unknown kind of edit script: %s' % kind)
+
+    report = benchmark(
+        grammar, args['<path>'], kinds,
+        seed=int(args['-s']),
+        scripts=int(args['-n']),
+        runs=int(args['-r']),
+        apply_edits=args['--apply-edits'],
+    )
+    if args['--save']:
+        with open(args['--save'], 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    baseline = None
+    if args['--baseline']:
+        with open(args['--baseline']) as f:
+            baseline = json.load(f)
+
+    if args['--json']:
+        print(json.dumps(report, indent=2, sort_keys=True))
+    else:
+        print_report(report, baseline)
+
+
+if __name__ == '__main__':
+    main(docopt(__doc__))
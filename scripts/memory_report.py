@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""
+Reports how much memory the trees of Python files use (estimated with
+:py:mod:`parso.memory`), per node and leaf class. Directories are searched for
+``*.py`` files.
+
+With --save, the report is written as JSON. It can be compared with a later
+run (e.g. after a change to parso) with --baseline.
+
+Usage:
+  memory_report.py [-v=<version>] [-n=<nr>] [--compact] [--indexes] [--json]
+                   [--save=<file>] [--baseline=<file>] <path>...
+  memory_report.py -h | --help
+
+Options:
+  -h --help          Show this screen.
+  -v <version>       The Python grammar version, defaults to the current one.
+  -n <nr>            Show the top n classes [default: 20].
+  --compact          Parse with compact=True.
+  --indexes          Generate the used names, the type index and the leaf
+                     positions of the modules before measuring.
+  --json             Print the report as JSON.
+  --save=<file>      Save the report as JSON.
+  --baseline=<file>  Compare with a report that was saved with --save.
+"""
+from __future__ import print_function
+
+import json
+import os
+
+from docopt import docopt
+
+import parso
+from parso.memory import MemoryReport, get_memory_report
+from parso.utils import python_bytes_to_unicode
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return python_bytes_to_unicode(f.read())
+
+
+def _iter_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if filename.endswith('.py'):
+                        yield os.path.join(root, filename)
+        else:
+            yield path
+
+
+def _format_delta(new, old):
+    delta = new - old
+    if not old:
+        return '%+12d %8s' % (delta, '')
+    return '%+12d %+7.1f%%' % (delta, 100.0 * delta / old)
+
+
+def _print_line(name, counts, baseline):
+    line = '%-25s %10s %12s' % (name, counts['count'], counts['bytes'])
+    if counts['count']:
+        line += ' %10.1f' % (counts['bytes'] / float(counts['count']))
+    else:
+        line += ' %10s' % ''
+    if baseline is not None:
+        line += ' ' + _format_delta(counts['bytes'], baseline['bytes'])
+    print(line)
+
+
+def print_report(report, top, baseline=None):
+    def get_baseline(*keys):
+        if baseline is None:
+            return None
+        dct = baseline
+        for key in keys:
+            # Classes that did not exist in the baseline are compared with 0.
+            dct = dct.get(key, dict(count=0, bytes=0))
+        return dct
+
+    print('modules: %s' % report['modules'])
+    header = '%-25s %10s %12s %10s' % ('', 'count', 'bytes', 'bytes/obj')
+    if baseline is not None:
+        header += ' %21s' % 'delta bytes'
+    print(header)
+
+    classes = sorted(report['classes'].items(),
+                     key=lambda x: x[1]['bytes'], reverse=True)
+    for name, counts in classes[:top]:
+        _print_line(name, counts, get_baseline('classes', name))
+    print()
+    for name in ('values', 'prefixes'):
+        _print_line(name, report[name], get_baseline(name))
+    print()
+    # The wrapper nodes of parameters and the used names are the overhead
+    # that is not needed to represent the code.
+    _print_line('Param', report['classes'].get('Param', dict(count=0, bytes=0)),
+                get_baseline('classes', 'Param'))
+    for name in ('used_names', 'type_index', 'leaf_positions'):
+        _print_line(name, report[name], get_baseline(name))
+    print()
+    for name in ('tree_bytes', 'total_bytes'):
+        line = '%-25s %10s %12s %10s' % (name, '', report[name], '')
+        if baseline is not None:
+            line += ' ' + _format_delta(report[name], baseline.get(name, 0))
+        print(line)
+
+
+def main(args):
+    grammar = parso.load_grammar(version=args['-v'])
+    report = MemoryReport()
+    for path in _iter_files(args['<path>']):
+        module = grammar.parse(_read(path), compact=args['--compact'])
+        if args['--indexes']:
+            module.get_used_names()
+            module.iter_nodes()
+            module.get_leaf_for_position(module.start_pos)
+        get_memory_report(module, report)
+
+    result = report.get_report()
+    if args['--save']:
+        with open(args['--save'], 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+
+    baseline = None
+    if args['--baseline']:
+        with open(args['--baseline']) as f:
+            baseline = json.load(f)
+
+    if args['--json']:
+        print(json.dumps(result, indent=2, sort_keys=True))
+    else:
+        print_report(result, int(args['-n']), baseline)
+
+
+if __name__ == '__main__':
+    main(docopt(__doc__))
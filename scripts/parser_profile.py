@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Profile the parser on Python files. Prints how often grammar rules are used by
+the parser, how often the error recovery kicks in and how much time is spent
+creating nodes and leaves.
+
+With --cprofile, ``cProfile`` is used instead. With --diff, the diff parser is
+profiled with ``cProfile`` (by appending a line to the file).
+
+Usage:
+  parser_profile.py [-v=<version>] [--json] [-n=<nr>] <file>...
+  parser_profile.py [-v=<version>] (--cprofile | --diff) [-s=<sort>] <file>
+  parser_profile.py -h | --help
+
+Options:
+  -h --help          Show this screen.
+  -v <version>       The Python grammar version, defaults to the current one.
+  --json             Print the report as JSON.
+  -n <nr>            Show the top n nonterminals [default: 20].
+  --cprofile         Use cProfile to profile a normal parse.
+  --diff             Use cProfile to profile the diff parser.
+  -s <sort>          Sort the profile results, e.g. cumtime, name [default: time].
+"""
+from __future__ import print_function
+
+import cProfile
+import json
+
+from docopt import docopt
+
+import parso
+from parso.profiling import ParserProfile, profile_parse
+from parso.python.diff import DiffParser
+from parso.utils import split_lines, python_bytes_to_unicode
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return python_bytes_to_unicode(f.read())
+
+
+def print_report(profile, top):
+    report = profile.get_report()
+    print('parse time: %.4fs' % report['parse_time'])
+    for name in ('convert_node', 'convert_leaf'):
+        print('%s: %s calls, %.4fs' % (name, report[name]['calls'], report[name]['time']))
+    print('error recoveries: %s' % report['error_recoveries'])
+    sizes = sorted(report['stack_removal_sizes'].items(), key=lambda x: int(x[0]))
+    print('stack removal sizes: %s' % ', '.join('%s: %s' % x for x in sizes))
+    print()
+    print('%-25s %10s %10s %10s %10s' % ('nonterminal', 'shifts', 'pushes', 'pops', 'removals'))
+    nonterminals = sorted(
+        report['nonterminals'].items(),
+        key=lambda x: x[1]['pushes'] + x[1]['shifts'],
+        reverse=True,
+    )
+    for nonterminal, counts in nonterminals[:top]:
+        print('%-25s %10s %10s %10s %10s' % (
+            nonterminal, counts['shifts'], counts['pushes'],
+            counts['pops'], counts['removals']
+        ))
+
+
+def run_diff(grammar, module, lines):
+    DiffParser(grammar._pgen_grammar, grammar._tokenizer, module).update(
+        old_lines=split_lines(module.get_code(), keepends=True),
+        new_lines=lines,
+    )
+
+
+def main(args):
+    grammar = parso.load_grammar(version=args['-v'])
+    if args['--cprofile']:
+        code = _read(args['<file>'][0])
+        cProfile.runctx('grammar.parse(code)', globals(), locals(), sort=args['-s'])
+    elif args['--diff']:
+        code = _read(args['<file>'][0])
+        module = grammar.parse(code)
+        # Add something so the diff parser needs to run.
+        lines = split_lines(code + '\na\n', keepends=True)
+        cProfile.runctx('run_diff(grammar, module, lines)', globals(), locals(),
+                        sort=args['-s'])
+    else:
+        profile = ParserProfile()
+        for path in args['<file>']:
+            profile_parse(grammar, _read(path), profile)
+        if args['--json']:
+            print(json.dumps(profile.get_report(), indent=2, sort_keys=True))
+        else:
+            print_report(profile, int(args['-n']))
+
+
+if __name__ == '__main__':
+    main(docopt(__doc__))
@@ -100,6 +100,13 @@ class LineCopy:
         )
 
 
+def _generate_indexes(module):
+    # The indexes are updated (and checked) by the diff parser if they were
+    # generated before.
+    module.get_used_names()
+    module.iter_nodes('funcdef')
+
+
 class FileModification:
     @classmethod
     def generate(cls, code_lines, change_count):
@@ -184,14 +191,17 @@ class FileModification:
         if self._check_original:
             m = grammar.parse(code, diff_cache=True)
             start1 = _get_first_error_start_pos_or_none(m)
+            _generate_indexes(m)
 
-        grammar.parse(modified_code, diff_cache=True)
+        m = grammar.parse(modified_code, diff_cache=True)
+        _generate_indexes(m)
 
         if self._check_original:
             # Also check if it's possible to "revert" the changes.
             m = grammar.parse(code, diff_cache=True)
             start2 = _get_first_error_start_pos_or_none(m)
             assert start1 == start2, (start1, start2)
+            _generate_indexes(m)
 
 
 class FileTests:
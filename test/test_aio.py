@@ -0,0 +1,115 @@
+"""
+Tests for the asyncio facade, only collected with Python 3.5+.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import parso
+from parso.aio import AsyncGrammar, load_grammar
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super(CountingExecutor, self).__init__(max_workers=4)
+        self.submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super(CountingExecutor, self).submit(*args, **kwargs)
+
+
+@pytest.fixture
+def executor():
+    executor = CountingExecutor()
+    yield executor
+    executor.shutdown()
+
+
+def _run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_parse(executor):
+    grammar = AsyncGrammar(parso.load_grammar(), executor=executor)
+    module = _run(grammar.parse('def foo(): pass\n'))
+    assert module.children[0].type == 'funcdef'
+    assert executor.submitted == 1
+
+
+def test_coalesce(executor):
+    grammar = AsyncGrammar(parso.load_grammar(), executor=executor)
+
+    async def parse_many():
+        return await asyncio.gather(
+            grammar.parse('foo = 1\n'),
+            grammar.parse('foo = 1\n'),
+            grammar.parse('foo = 2\n'),
+            grammar.parse('foo = 1\n', error_recovery=False),
+        )
+
+    m1, m2, m3, m4 = _run(parse_many())
+    assert m1 is m2
+    assert m1 is not m3 and m1 is not m4
+    assert executor.submitted == 3
+    assert not grammar._pending
+
+    # Parses that are finished are not reused.
+    assert _run(grammar.parse('foo = 1\n')) is not m1
+
+
+def test_path(executor, tmpdir):
+    path = tmpdir.join('foo.py')
+    path.write('a = 3\n')
+    grammar = AsyncGrammar(parso.load_grammar(), executor=executor)
+
+    async def parse_many():
+        return await asyncio.gather(*[
+            grammar.parse(path=str(path), cache=True) for _ in range(5)
+        ])
+
+    modules = _run(parse_many())
+    assert modules[0].get_code() == 'a = 3\n'
+    assert all(m is modules[0] for m in modules)
+    # The files are read in the executor and the parse only happens once.
+    assert executor.submitted == 5 + 1
+
+    # A cached module is found in the executor, too.
+    assert _run(grammar.parse(path=str(path), cache=True)) is modules[0]
+
+
+def test_error(executor):
+    grammar = AsyncGrammar(parso.load_grammar(), executor=executor)
+
+    async def parse_many():
+        return await asyncio.gather(
+            grammar.parse('foo(', error_recovery=False),
+            grammar.parse('foo(', error_recovery=False),
+            return_exceptions=True,
+        )
+
+    e1, e2 = _run(parse_many())
+    assert isinstance(e1, parso.ParserSyntaxError)
+    assert e1 is e2
+    assert executor.submitted == 1
+
+
+def test_load_grammar_and_iter_errors(executor):
+    async def run():
+        grammar = await load_grammar(version='3.6', executor=executor)
+        module = await grammar.parse('continue\n')
+        return await grammar.iter_errors(module)
+
+    error, = _run(run())
+    assert error.message == "SyntaxError: 'continue' not properly in loop"
+    assert executor.submitted == 3
+
+
+def test_missing_code():
+    with pytest.raises(TypeError):
+        _run(AsyncGrammar(parso.load_grammar()).parse())
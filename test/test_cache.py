@@ -87,3 +87,17 @@ def test_modulepickling_simulate_deleted_cache(tmpdir):
 
     cached2 = load_module(grammar._hashed, io)
     assert cached2 is None
+
+
+def test_old_versions_are_not_pickled(tmpdir):
+    item = _NodeCacheItem('bla', [], document_version=2)
+    item.old_items = [_NodeCacheItem('old', [], document_version=1)]
+    hashed_grammar = load_grammar()._hashed
+    _save_to_file_system(hashed_grammar, 'fake path', item, cache_path=str(tmpdir))
+    parser_cache.clear()
+    load_stored_item(hashed_grammar, 'fake path', item, cache_path=str(tmpdir))
+    loaded = parser_cache[hashed_grammar]['fake path']
+    assert loaded.document_version == 2
+    assert loaded.old_items == []
+    assert item.get_version(1).node == 'old'
+    assert loaded.get_version(1) is None
@@ -0,0 +1,76 @@
+import sys
+from textwrap import dedent
+
+import pytest
+
+from parso import load_grammar
+
+
+CODE = dedent('''\
+    import os
+
+    class Foo(Bar):  # comment
+        """doc"""
+        def method(self, a):
+            self.a = a
+            return self.a + 1.0
+
+    def broken(self):
+        )
+        return self
+    ''')
+
+
+def _walk(node):
+    yield node
+    for child in getattr(node, 'children', []):
+        for n in _walk(child):
+            yield n
+
+
+def _describe(node):
+    return [
+        (n.type, getattr(n, 'value', None), getattr(n, 'prefix', None), n.start_pos)
+        for n in _walk(node)
+    ]
+
+
+@pytest.mark.parametrize('bodies', ['parse', 'skip'])
+def test_same_tree(bodies):
+    grammar = load_grammar()
+    compact = grammar.parse(CODE, compact=True, bodies=bodies)
+    assert compact.get_code() == CODE
+    assert _describe(compact) == _describe(grammar.parse(CODE))
+    assert [e.message for e in grammar.iter_errors(compact)] \
+        == [e.message for e in grammar.iter_errors(grammar.parse(CODE))]
+
+
+def test_interned():
+    grammar = load_grammar()
+    module = grammar.parse(CODE, compact=True)
+    selfs = [n for n in _walk(module) if getattr(n, 'value', None) == 'self']
+    assert len(selfs) == 5
+    assert all(n.value is selfs[0].value for n in selfs)
+
+    if sys.version_info >= (3,):
+        # Python 2 only shares the strings within a tree.
+        other = grammar.parse('self\n' + CODE, compact=True)
+        assert other.get_first_leaf().value is selfs[0].value
+
+    prefixes = [n.prefix for n in _walk(module) if getattr(n, 'prefix', '') == ' ' * 8]
+    assert len(prefixes) == 2
+    assert prefixes[0] is prefixes[1]
+
+
+def test_children_not_overallocated():
+    grammar = load_grammar()
+    module = grammar.parse(CODE, compact=True)
+    normal = grammar.parse(CODE)
+    size = sum(sys.getsizeof(n.children) for n in _walk(module) if hasattr(n, 'children'))
+    normal_size = sum(sys.getsizeof(n.children) for n in _walk(normal) if hasattr(n, 'children'))
+    assert size < normal_size
+
+
+def test_diff_cache():
+    with pytest.raises(NotImplementedError):
+        load_grammar().parse('x', compact=True, diff_cache=True, path='/foo.py')
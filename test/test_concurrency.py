@@ -0,0 +1,122 @@
+"""
+Stress tests for using grammars and caches from multiple threads.
+"""
+import gc
+import threading
+
+import parso
+from parso import cache
+from parso.python.diff import _assert_valid_graph
+
+THREAD_COUNT = 8
+ITERATIONS = 30
+
+
+def _run_threads(target):
+    errors = []
+
+    def run(thread_index):
+        try:
+            target(thread_index)
+        except Exception as e:
+            errors.append(e)
+            raise
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(THREAD_COUNT)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+
+
+def _code(thread_index, i):
+    return (
+        'import os\n\n'
+        'def foo%s():\n'
+        '    return %s\n\n'
+        'class Bar:\n'
+        '    x = [%s,\n'
+        '         1]\n' % (thread_index, i, 'a' * (i % 5 + 1))
+    )
+
+
+def test_load_grammar():
+    grammars = []
+    # Load a grammar that was probably not loaded, yet.
+    cache_key = [k for k in parso.grammar._loaded_grammars if k.endswith('grammar26.txt')]
+    for key in cache_key:
+        del parso.grammar._loaded_grammars[key]
+    _run_threads(lambda i: grammars.append(parso.load_grammar(version='2.6')))
+    assert len(set(map(id, grammars))) == 1
+
+
+def test_parse():
+    grammar = parso.load_grammar()
+
+    def parse(thread_index):
+        for i in range(ITERATIONS):
+            code = _code(thread_index, i)
+            assert grammar.parse(code).get_code() == code
+            errors = list(grammar.iter_errors(grammar.parse(code + ')')))
+            assert len(errors) == 1
+
+    _run_threads(parse)
+
+
+def test_diff_cache_own_paths():
+    grammar = parso.load_grammar()
+
+    def parse(thread_index):
+        path = '/some/path/%s.py' % thread_index
+        for i in range(ITERATIONS):
+            code = _code(thread_index, i)
+            module = grammar.parse(code, path=path, diff_cache=True)
+            assert module.get_code() == code
+
+    _run_threads(parse)
+
+
+def test_diff_cache_shared_path():
+    grammar = parso.load_grammar()
+    path = '/some/shared/path.py'
+
+    def parse(thread_index):
+        for i in range(ITERATIONS):
+            grammar.parse(_code(thread_index, i), path=path, diff_cache=True)
+
+    _run_threads(parse)
+
+    # The cached module must still be valid and match the cached lines.
+    item = cache.parser_cache[grammar._hashed][path]
+    assert item.node.get_code() == ''.join(item.lines)
+    _assert_valid_graph(item.node)
+    code = _code(0, 0)
+    assert grammar.parse(code, path=path, diff_cache=True).get_code() == code
+
+
+def test_pickle_cache(tmpdir):
+    grammar = parso.load_grammar()
+    path = tmpdir.join('module.py')
+    path.write('x = 1\n')
+
+    def parse(thread_index):
+        for i in range(ITERATIONS):
+            module = grammar.parse(path=str(path), cache=True, cache_path=str(tmpdir))
+            assert module.get_code() == 'x = 1\n'
+            cache.parser_cache.clear()
+
+    _run_threads(parse)
+    assert not [p for p in tmpdir.visit() if p.ext == '.tmp']
+
+
+def test_diff_cache_locks_are_freed():
+    grammar = parso.load_grammar()
+    for i in range(10):
+        grammar.parse('x = %s\n' % i, path='/lock%s.py' % i, diff_cache=True)
+    lock = cache.get_diff_cache_lock(grammar._hashed, '/lock0.py')
+    assert cache.get_diff_cache_lock(grammar._hashed, '/lock0.py') is lock
+    gc.collect()
+    keys = [key for key in cache._diff_cache_locks.keys()
+            if str(key[1]).startswith('/lock')]
+    assert keys == [(grammar._hashed, '/lock0.py')]
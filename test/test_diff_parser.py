@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from textwrap import dedent
+import gc
 import logging
 import sys
 
@@ -8,8 +9,10 @@ import pytest
 from parso.utils import split_lines
 from parso import cache
 from parso import load_grammar
-from parso.python.diff import DiffParser, _assert_valid_graph
+from parso.python.diff import DiffParser, DiffStats, _assert_valid_graph, \
+    _assert_valid_indexes
 from parso import parse
+from parso.tree import iter_descendants
 
 ANY = object()
 
@@ -24,24 +27,18 @@ def test_simple():
 
 
 def _check_error_leaves_nodes(node):
-    if node.type in ('error_leaf', 'error_node'):
-        return node
-
-    try:
-        children = node.children
-    except AttributeError:
-        pass
-    else:
-        for child in children:
-            x_node = _check_error_leaves_nodes(child)
-            if x_node is not None:
-                return x_node
+    for node in iter_descendants(node):
+        if node.type in ('error_leaf', 'error_node'):
+            return node
     return None
 
 
 class Differ(object):
     grammar = load_grammar()
 
+    def __init__(self, copy=False):
+        self.copy = copy
+
     def initialize(self, code):
         logging.debug('differ: initialize')
         try:
@@ -58,29 +55,40 @@ class Differ(object):
     def parse(self, code, copies=0, parsers=0, expect_error_leaves=False):
         logging.debug('differ: parse copies=%s parsers=%s', copies, parsers)
         lines = split_lines(code, keepends=True)
+        # Generate the indexes, so they are updated by the diff parser.
+        self.module.get_used_names()
+        self.module.iter_nodes('funcdef')
         diff_parser = DiffParser(
             self.grammar._pgen_grammar,
             self.grammar._tokenizer,
             self.module,
         )
-        new_module = diff_parser.update(self.lines, lines)
+        old_code = self.module.get_code()
+        new_module = diff_parser.update(self.lines, lines, copy=self.copy)
         self.lines = lines
         assert code == new_module.get_code()
+        if self.copy:
+            # The old module is not changed.
+            assert new_module is not self.module
+            assert old_code == self.module.get_code()
+            _assert_valid_graph(self.module)
+            self.module = new_module
 
         _assert_valid_graph(new_module)
+        _assert_valid_indexes(new_module)
 
         error_node = _check_error_leaves_nodes(new_module)
         assert expect_error_leaves == (error_node is not None), error_node
         if parsers is not ANY:
-            assert diff_parser._parser_count == parsers
+            assert diff_parser.stats.parser_runs == parsers
         if copies is not ANY:
-            assert diff_parser._copy_count == copies
+            assert diff_parser.stats.copies == copies
         return new_module
 
 
-@pytest.fixture()
-def differ():
-    return Differ()
+@pytest.fixture(params=[False, True], ids=['in_place', 'copy'])
+def differ(request):
+    return Differ(copy=request.param)
 
 
 def test_change_and_undo(differ):
@@ -192,7 +200,7 @@ def test_for_on_one_line(differ):
             pass
     """)
     # The second parser is for parsing the `def nested()` which is an `equal`
-    # operation in the SequenceMatcher.
+    # operation in the line diff.
     differ.parse(src, parsers=1, copies=1)
 
 
@@ -1286,3 +1294,376 @@ def test_async_copy(differ):
     differ.initialize(code1)
     differ.parse(code2, copies=1, parsers=1)
     differ.parse(code1, copies=1, parsers=1, expect_error_leaves=True)
+
+
+def test_used_names_update(differ):
+    code1 = dedent('''\
+        def foo(a):
+            b = a
+            return b
+
+        class C:
+            def bar(self, a):
+                return a
+        ''')
+    code2 = dedent('''\
+        def foo(a):
+            c = a
+            return c
+
+        class C:
+            def bar(self, a):
+                return a
+        ''')
+    module = differ.initialize(code1)
+    used_names = module.get_used_names()
+    old_a_names = list(used_names['a'])
+
+    module = differ.parse(code2, parsers=ANY, copies=ANY)
+    new_used_names = module.get_used_names()
+    assert new_used_names is not used_names
+    assert 'b' not in new_used_names
+    assert [name.start_pos for name in new_used_names['c']] == [(2, 4), (3, 11)]
+    # The old mapping is not modified.
+    assert used_names['a'] == old_a_names
+    assert [name.start_pos for name in used_names['b']] == [(2, 4), (3, 11)]
+
+
+def test_index_update_after_tree_changes(differ):
+    code1 = 'def foo(a):\n    b = a\n    return b\n'
+    module = differ.initialize(code1)
+    module.get_used_names()
+    list(module.iter_nodes('expr_stmt'))
+    # The indexes don't know about changes that are made by hand.
+    name = module.children[0].children[-1].children[1].children[0].children[0]
+    assert name.value == 'b'
+    name.value = 'x'
+    module._type_index['expr_stmt'] = []
+
+    module = differ.parse('def foo(a):\n    return a\n', parsers=ANY, copies=ANY)
+    used_names = module.get_used_names()
+    assert sorted(used_names) == ['a', 'foo']
+    assert [n.start_pos for n in used_names['a']] == [(1, 8), (2, 11)]
+    assert list(module.iter_nodes('expr_stmt')) == []
+
+
+def _apply_edit(code, start_pos, end_pos, new_text):
+    lines = split_lines(code, keepends=True)
+
+    def offset(pos):
+        return sum(len(line) for line in lines[:pos[0] - 1]) + pos[1]
+
+    return code[:offset(start_pos)] + new_text + code[offset(end_pos):]
+
+
+@pytest.mark.parametrize(
+    'edits', [
+        [],
+        [((2, 11), (2, 12), '2 + 3')],
+        [((1, 0), (1, 0), 'import os\n')],
+        [((3, 0), (4, 0), '')],
+        [((1, 4), (5, 0), 'g():\n    pass\n\n')],
+        [((5, 6), (5, 6), 'f()')],
+        [((2, 4), (2, 10), 'if 1:\n        return'), ((4, 0), (4, 0), '\n\n')],
+        [((5, 0), (5, 6), 'def h('), ((5, 6), (5, 6), ')')],
+    ]
+)
+def test_apply_edits(edits):
+    grammar = load_grammar()
+    path = '/apply_edits.py'
+    code = 'def f():\n    return 1\n\nx = 3\nfoo = \n'
+    module = grammar.parse(code, path=path, diff_cache=True)
+    module.get_used_names()
+    for edit in edits:
+        code = _apply_edit(code, *edit)
+
+    assert grammar.apply_edits(path, edits) is module
+    assert module.get_code() == code
+    _assert_valid_graph(module)
+    _assert_valid_indexes(module)
+    assert grammar.parse(code, path=path, diff_cache=True) is module
+    assert cache.parser_cache[grammar._hashed][path].lines \
+        == split_lines(code, keepends=True)
+
+
+def test_apply_edits_errors():
+    grammar = load_grammar()
+    with pytest.raises(ValueError):
+        grammar.apply_edits('/not_cached.py', [])
+
+    path = '/apply_edits_errors.py'
+    grammar.parse('x = 1\n', path=path, diff_cache=True)
+    for start_pos, end_pos in [((0, 0), (1, 0)), ((1, 0), (3, 0)),
+                               ((1, 6), (1, 6)), ((1, 3), (1, 2))]:
+        with pytest.raises(ValueError):
+            grammar.apply_edits(path, [(start_pos, end_pos, 'y')])
+    assert grammar.apply_edits(path, [((1, 5), (2, 0), '2\n')]).get_code() \
+        == 'x = 12\n'
+
+
+@pytest.mark.parametrize(
+    'code, edits', [
+        # The '\r' of the line before the edit and the new '\n'.
+        ('if 1:\n    pass\n\r', [((4, 0), (4, 0), '\n)'), ((4, 0), (4, 1), 'x')]),
+        ('x\ry\n', [((2, 0), (2, 1), ''), ((1, 1), (1, 1), 'z')]),
+        # The new '\r' and the '\n' of the line after the edit.
+        ('x = 1\n\ny = 2\n', [((1, 0), (2, 0), 'a\r'), ((2, 0), (2, 1), 'b')]),
+        ('x = 1\n', [((2, 0), (2, 0), 'y\r'), ((3, 0), (3, 0), '\nz')]),
+    ]
+)
+def test_apply_edits_carriage_return(code, edits):
+    grammar = load_grammar()
+    path = '/apply_edits_carriage_return.py'
+    grammar.parse(code, path=path, diff_cache=True)
+    for edit in edits:
+        code = _apply_edit(code, *edit)
+        module = grammar.apply_edits(path, [edit])
+        assert module.get_code() == code
+        assert cache.parser_cache[grammar._hashed][path].lines \
+            == split_lines(module.get_code(), keepends=True)
+        _assert_valid_graph(module)
+
+
+def test_insert_above_deeply_nested(differ):
+    depth = sys.getrecursionlimit() * 2
+    code = 'x = ' + '(' * depth + '1' + ')' * depth + '\n'
+    differ.initialize(code)
+    # Moves all leaves of the copied statement to the next line.
+    module = differ.parse('import os\n' + code, parsers=1, copies=1)
+    assert module.children[1].start_pos == (2, 0)
+    assert module.get_last_leaf().end_pos == (3, 0)
+
+
+def test_diff_stats():
+    grammar = load_grammar()
+    path = '/diff_stats.py'
+    code = 'def f():\n    return 1\n\n\nx = f()\ny = 2\n'
+    total = DiffStats()
+
+    stats = DiffStats()
+    grammar.parse(code, path=path, diff_cache=True, diff_stats=stats)
+    assert stats.full_parses == 1
+    assert stats.updates == 0
+    total.merge(stats)
+
+    stats = DiffStats()
+    grammar.parse(code.replace('x', 'z'), path=path, diff_cache=True,
+                  diff_stats=stats)
+    assert stats.full_parses == 0
+    assert stats.updates == 1
+    assert stats.opcodes == {'equal': 2, 'replace': 1}
+    assert stats.copies == 2
+    assert stats.parser_runs == 1
+    # The empty line after the last newline is not counted.
+    assert stats.copied_lines + stats.parsed_lines == 6
+    assert stats.update_time >= stats.diff_time + stats.copy_time + stats.parse_time
+    total.merge(stats)
+
+    stats = DiffStats()
+    grammar.apply_edits(path, [((1, 4), (1, 5), 'g')], diff_stats=stats)
+    assert stats.updates == 1
+    assert stats.parser_runs == 1
+    # The lines were not diffed.
+    assert stats.diff_time == 0
+    total.merge(stats)
+
+    report = total.get_report()
+    assert report['updates'] == 2
+    assert report['full_parses'] == 1
+    assert report['opcodes'] == {'equal': 3, 'replace': 2}
+    assert report['max_update_time'] <= report['update_time']
+
+
+def test_reparse_big_changes():
+    grammar = load_grammar()
+    path = '/reparse.py'
+    code = ''.join('def f%s():\n    return %s\n\n\n' % (i, i) for i in range(100))
+    module = grammar.parse(code, path=path, diff_cache=True)
+    module.get_used_names()
+    first_function = module.children[0]
+
+    # A small change is handled by the diff parser.
+    stats = DiffStats()
+    code = code.replace('return 5\n', 'return 6\n')
+    assert grammar.parse(code, path=path, diff_cache=True,
+                         diff_stats=stats) is module
+    assert stats.updates == 1
+    assert stats.full_parses == 0
+    assert module.children[0] is first_function
+
+    # Changing every function parses everything again.
+    stats = DiffStats()
+    code = code.replace('return', 'yield')
+    assert grammar.parse(code, path=path, diff_cache=True,
+                         diff_stats=stats) is module
+    assert stats.updates == 0
+    assert stats.full_parses == 1
+    assert stats.parser_runs == 0
+    assert module.children[0] is not first_function
+    assert module.get_code() == code
+    _assert_valid_graph(module)
+    _assert_valid_indexes(module)
+    assert [n.value for n in module.get_used_names()['f0']] == ['f0']
+
+
+def test_copy_on_update():
+    grammar = load_grammar()
+    path = '/copy_on_update.py'
+    code1 = 'def f():\n    return 1\n\n\nx = f()\n'
+    module1 = grammar.parse(code1, path=path, diff_cache=True)
+    leaves1 = list(iter_descendants(module1))
+
+    code2 = code1.replace('x', 'y')
+    stats = DiffStats()
+    module2 = grammar.parse(code2, path=path, diff_cache=True,
+                            copy_on_update=True, diff_stats=stats)
+    assert stats.updates == 1
+    assert module2 is not module1
+    assert module2.get_code() == code2
+    assert module1.get_code() == code1
+    assert list(iter_descendants(module1)) == leaves1
+    _assert_valid_graph(module1)
+    _assert_valid_graph(module2)
+    # The new module is cached.
+    assert grammar.parse(code2, path=path, diff_cache=True) is module2
+
+    module3 = grammar.apply_edits(path, [((2, 11), (2, 12), '2')],
+                                  copy_on_update=True)
+    assert module3.get_code() == code2.replace('1', '2')
+    assert module2.get_code() == code2
+
+    # Parsing everything again doesn't change the old module either.
+    code4 = ''.join('z%s = %s\n' % (i, i) for i in range(200))
+    stats = DiffStats()
+    module4 = grammar.parse(code4, path=path, diff_cache=True,
+                            copy_on_update=True, diff_stats=stats)
+    assert stats.full_parses == 1
+    assert module4.get_code() == code4
+    assert module3.get_code() == code2.replace('1', '2')
+
+
+def test_copy_on_update_keeps_gc_disabled():
+    grammar = load_grammar()
+    path = '/copy_on_update_gc.py'
+    grammar.parse('x = 1\n', path=path, diff_cache=True)
+    gc.disable()
+    try:
+        module = grammar.parse('x = 2\n', path=path, diff_cache=True,
+                               copy_on_update=True)
+        assert not gc.isenabled()
+    finally:
+        gc.enable()
+    assert module.get_code() == 'x = 2\n'
+
+
+def test_issue_cache():
+    def get_issues(module):
+        return sorted((i.start_pos, i.code, i.message)
+                      for i in grammar.iter_errors(module))
+
+    grammar = load_grammar()
+    path = '/issue_cache.py'
+    code1 = dedent('''\
+        from __future__ import division
+        x = 1
+
+
+        def f():
+            global x
+            x = 2
+            def g():
+                nonlocal y
+
+
+        def h():
+            return 1 +
+
+
+        class C:
+            yield 1
+        ''')
+    module = grammar.parse(code1, path=path, diff_cache=True)
+    assert get_issues(module) == get_issues(grammar.parse(code1))
+    cache = dict(module._issue_cache)
+    # Neither the future import nor the statements with syntax errors are
+    # cached.
+    cached_types = sorted(node.type for node in cache)
+    assert cached_types == ['classdef', 'endmarker', 'funcdef', 'simple_stmt']
+
+    code2 = code1.replace('return 1 +', 'return 1')
+    module = grammar.parse(code2, path=path, diff_cache=True)
+    issues = get_issues(module)
+    assert issues == get_issues(grammar.parse(code2))
+    # The statements before the change were copied and are still cached.
+    reused = [node.type for node, cached in module._issue_cache.items()
+              if cache.get(node) is cached]
+    assert sorted(reused) == ['funcdef', 'simple_stmt']
+
+    code3 = code2.replace('x = 2', 'y = 2')
+    module = grammar.parse(code3, path=path, diff_cache=True)
+    assert get_issues(module) == get_issues(grammar.parse(code3))
+    assert get_issues(module) != issues
+
+    # Without a cache, nothing is cached.
+    module = grammar.parse(code3)
+    assert module._issue_cache is None
+    get_issues(module)
+    assert module._issue_cache is None
+
+
+def test_keep_versions():
+    def get_issues(module):
+        return sorted((i.start_pos, i.code, i.message)
+                      for i in grammar.iter_errors(module))
+
+    grammar = load_grammar()
+    path = '/keep_versions.py'
+    codes = ['x = %s\n\n\ndef f():\n    return x\n\n\ny = x +\n' % i
+             for i in range(4)]
+    modules = []
+    for version, code in enumerate(codes):
+        module = grammar.parse(code, path=path, diff_cache=True,
+                               document_version=version, keep_versions=2)
+        assert get_issues(module) == get_issues(grammar.parse(code))
+        modules.append(module)
+    assert len(set(modules)) == 4
+
+    # The two versions before the newest one are kept, unchanged.
+    assert grammar.get_cached_module(path, document_version=0) is None
+    for version in (1, 2, 3):
+        module = grammar.get_cached_module(path, document_version=version)
+        assert module is modules[version]
+        assert module.get_code() == codes[version]
+        _assert_valid_graph(module)
+    assert grammar.get_cached_module(path) is modules[3]
+    assert grammar.get_cached_module('/not_cached.py') is None
+
+    # The leaves that were copied share their strings.
+    name1 = modules[1].children[1].name
+    name3 = modules[3].children[1].name
+    assert name1 is not name3
+    assert name1.value is name3.value
+
+    # Parsing the code of a kept version returns its module.
+    stats = DiffStats()
+    module = grammar.parse(codes[1], path=path, diff_cache=True,
+                           document_version=1, keep_versions=2,
+                           diff_stats=stats)
+    assert module is modules[1]
+    assert stats.updates == stats.full_parses == 0
+    assert grammar.get_cached_module(path) is modules[3]
+
+    # The same code with a new version shares the module.
+    module = grammar.apply_edits(path, [], document_version=4, keep_versions=2)
+    assert module is modules[3]
+    assert grammar.get_cached_module(path, document_version=3) is modules[3]
+    assert grammar.get_cached_module(path, document_version=2) is modules[2]
+    assert grammar.get_cached_module(path, document_version=1) is None
+
+    module = grammar.apply_edits(path, [((1, 4), (1, 5), '5')],
+                                 document_version=5, keep_versions=2)
+    assert module.get_code() == codes[0].replace('0', '5')
+    assert grammar.get_cached_module(path, document_version=4) is modules[3]
+
+    with pytest.raises(ValueError):
+        grammar.parse(codes[0], keep_versions=2)
@@ -1,6 +1,7 @@
 import os
 
 import parso
+from parso.utils import parse_version_string
 
 
 def get_python_files(path):
@@ -18,6 +19,9 @@ def test_on_itself(each_version):
     grammar = parso.load_grammar(version=each_version)
     path = os.path.dirname(os.path.dirname(__file__)) + '/parso'
     for file in get_python_files(path):
+        if file.endswith('aio.py') and parse_version_string(each_version) < (3, 5):
+            # Uses async/await.
+            continue
         tree = grammar.parse(path=file)
         errors = list(grammar.iter_errors(tree))
         assert not errors
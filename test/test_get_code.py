@@ -1,8 +1,11 @@
 import difflib
+import sys
 
 import pytest
 
-from parso import parse
+from parso import parse, load_grammar
+from parso.python.tree import Name
+from parso.tree import Node
 
 code_basic_features = '''
 """A mod docstring"""
@@ -118,3 +121,26 @@ def test_carriage_return_at_end(code, types):
     assert tree.get_code() == code
     assert [c.type for c in tree.children] == types
     assert tree.end_pos == (len(code) + 1, 0)
+
+
+def test_get_code_with_overwritten_get_code():
+    code = 'def f(a, b):\n    x = 1\n\n\ndef g(c=3, d=4): pass\n'
+    module = load_grammar().parse(code, bodies='skip')
+    assert module.get_code() == code
+    # The lazy suite returns its code without parsing it.
+    assert not module.children[0].children[-1].is_parsed()
+    funcdef = module.children[1]
+    assert funcdef.get_code(include_prefix=False) == 'def g(c=3, d=4): pass\n'
+
+    param = funcdef.get_params()[0]
+    assert param.get_code(include_comma=False) == 'c=3'
+    assert funcdef.children[2].get_code() == '(c=3, d=4)'
+
+
+def test_get_code_deep_tree():
+    leaf = Name('x', (1, 0), prefix=' ')
+    node = leaf
+    for _ in range(sys.getrecursionlimit() * 2):
+        node = Node('atom', [node])
+    assert node.get_code() == ' x'
+    assert node.get_code(include_prefix=False) == 'x'
@@ -6,3 +6,23 @@ import pytest
 def test_non_unicode():
     with pytest.raises(UnicodeDecodeError):
         parso.parse(b'\xe4')
+
+
+def test_parser_reuse():
+    grammar = parso.load_grammar()
+    module1 = grammar.parse('def x(:\n  pass\n')
+    parsers = grammar._parser_pool.parsers[True, 'file_input', 'parse', False]
+    parser, = parsers
+    assert parser.stack is None
+
+    module2 = grammar.parse('x = 1\n')
+    assert parsers == [parser]
+    assert module1.get_code() == 'def x(:\n  pass\n'
+    assert module2.children[0].type == 'simple_stmt'
+    assert parser.syntax_errors == []
+    assert parser._omit_dedent_list == []
+
+    # Errors don't leave a broken parser in the pool.
+    with pytest.raises(parso.ParserSyntaxError):
+        grammar.parse('x = (', error_recovery=False)
+    assert grammar.parse('x = 1', error_recovery=False).get_code() == 'x = 1'
@@ -0,0 +1,116 @@
+import difflib
+import random
+
+import pytest
+
+from parso.line_diff import get_opcodes, get_matching_blocks, get_edit_opcodes
+
+
+def _check_opcodes(old, new, opcodes=None):
+    if opcodes is None:
+        opcodes = get_opcodes(old, new)
+    i = j = 0
+    previous_tag = 'equal'
+    for tag, i1, i2, j1, j2 in opcodes:
+        assert (i1, j1) == (i, j)
+        if tag == 'equal':
+            assert i2 > i1
+            assert old[i1:i2] == new[j1:j2]
+        else:
+            # Like difflib, changes are never next to each other.
+            assert previous_tag == 'equal'
+            assert (i2 > i1, j2 > j1) == {
+                'replace': (True, True),
+                'delete': (True, False),
+                'insert': (False, True),
+            }[tag]
+        previous_tag = tag
+        i, j = i2, j2
+    assert (i, j) == (len(old), len(new))
+    return opcodes
+
+
+@pytest.mark.parametrize(
+    'old, new', [
+        ('', ''),
+        ('a', ''),
+        ('', 'a'),
+        ('abc', 'abc'),
+        ('abc', 'axc'),
+        ('abc', 'ac'),
+        ('ac', 'abc'),
+        ('abcd', 'xbcy'),
+        ('abcd', 'dcba'),
+    ]
+)
+def test_same_as_difflib(old, new):
+    old = list(old)
+    new = list(new)
+    expected = difflib.SequenceMatcher(None, old, new).get_opcodes()
+    assert _check_opcodes(old, new) == expected
+
+
+def test_matching_blocks():
+    old = ['a\n', 'b\n', 'c\n', 'd\n']
+    new = ['a\n', 'x\n', 'c\n', 'd\n', 'e\n']
+    assert get_matching_blocks(old, new) == [(0, 0, 1), (2, 2, 2), (4, 5, 0)]
+
+
+def test_repeated_lines():
+    # Lines that are not unique are matched as well.
+    old = ['\n', 'pass\n', '\n', 'pass\n', '\n']
+    new = ['\n', 'pass\n', 'x\n', '\n', 'pass\n', '\n']
+    opcodes = _check_opcodes(old, new)
+    assert sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == 'equal') == 5
+
+
+def test_moved_lines():
+    old = ['a\n', 'b\n', 'c\n', 'd\n', 'e\n']
+    new = ['d\n', 'a\n', 'b\n', 'c\n', 'e\n']
+    assert _check_opcodes(old, new) == [
+        ('insert', 0, 0, 0, 1),
+        ('equal', 0, 3, 1, 4),
+        ('delete', 3, 4, 4, 4),
+        ('equal', 4, 5, 4, 5),
+    ]
+
+
+def test_random_edits():
+    r = random.Random(0)
+    for _ in range(500):
+        alphabet = [str(i) for i in range(r.randint(1, 12))]
+        old = [r.choice(alphabet) for _ in range(r.randint(0, 30))]
+        new = list(old)
+        for _ in range(r.randint(0, 6)):
+            index = r.randint(0, len(new))
+            if r.random() < 0.5:
+                new.insert(index, r.choice(alphabet))
+            else:
+                del new[index:index + 1]
+        _check_opcodes(old, new)
+
+
+def test_edit_opcodes():
+    assert get_edit_opcodes(3, []) == [('equal', 0, 3, 0, 3)]
+    assert get_edit_opcodes(3, [(1, 2, 2)]) == [
+        ('equal', 0, 1, 0, 1),
+        ('replace', 1, 2, 1, 3),
+        ('equal', 2, 3, 3, 4),
+    ]
+
+    r = random.Random(0)
+    for _ in range(500):
+        old = [object() for _ in range(r.randint(0, 20))]
+        new = list(old)
+        edits = []
+        for _ in range(r.randint(0, 4)):
+            start = r.randint(0, len(new))
+            end = r.randint(start, len(new))
+            count = r.randint(0, 3)
+            new[start:end] = [object() for _ in range(count)]
+            edits.append((start, end, count))
+        opcodes = get_edit_opcodes(len(old), edits)
+        _check_opcodes(old, new, opcodes)
+        # Lines that were not edited are always equal.
+        assert sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == 'equal') \
+            == len(set(old) & set(new))
@@ -0,0 +1,67 @@
+import json
+import sys
+
+from parso import load_grammar
+from parso.memory import MemoryReport, get_memory_report
+
+
+def test_counts():
+    code = 'def foo(a, b):\n    return a + b\n'
+    module = load_grammar().parse(code)
+    report = get_memory_report(module)
+
+    assert report.modules == 1
+    assert report.classes['Module'].count == 1
+    assert report.classes['Function'].count == 1
+    assert report.classes['Param'].count == 2
+    assert report.classes['Name'].count == 5
+    # Leaves use __slots__, therefore all leaves of a class have the same size.
+    assert report.classes['Name'].bytes == 5 * sys.getsizeof(module.children[0].name)
+    # The empty prefix is shared by most leaves and only counted once.
+    assert report.prefixes.count < 5
+    assert report.tree_bytes == report.total_bytes
+    assert report.used_names.count == 0
+
+    module.get_used_names()
+    module.iter_nodes()
+    module.get_leaf_for_position((1, 0))
+    report = get_memory_report(module)
+    assert report.used_names.count == 1
+    assert report.type_index.count == 1
+    assert report.leaf_positions.count == 1
+    assert report.total_bytes > report.tree_bytes
+
+
+def test_lazy_bodies_stay_unparsed():
+    code = 'def foo():\n    x = 1\n    return x\n'
+    module = load_grammar().parse(code, bodies='skip')
+    suite = module.children[0].children[-1]
+    report = get_memory_report(module)
+    assert not suite.is_parsed()
+    assert 'ReturnStmt' not in report.classes
+    assert report.classes['LazySuite'].count == 1
+
+    suite.children
+    assert 'ReturnStmt' in get_memory_report(module).classes
+
+
+def test_merge():
+    grammar = load_grammar()
+    first = get_memory_report(grammar.parse('foo(1)\n'))
+    second = get_memory_report(grammar.parse('bar = 3\n'))
+    merged = MemoryReport()
+    merged.merge(first)
+    merged.merge(second)
+
+    assert merged.modules == 2
+    assert merged.classes['Module'].count == 2
+    assert merged.total_bytes == first.total_bytes + second.total_bytes
+
+    # The same report can also be passed to get_memory_report.
+    report = get_memory_report(grammar.parse('foo(1)\n'))
+    get_memory_report(grammar.parse('bar = 3\n'), report)
+    assert report.get_report() == merged.get_report()
+
+    report = json.loads(json.dumps(merged.get_report()))
+    assert report['classes']['Module']['count'] == 2
+    assert report['total_bytes'] == merged.total_bytes
@@ -1,11 +1,13 @@
 # -*- coding: utf-8    # This file contains Unicode characters.
 
+import sys
 from textwrap import dedent
 
 import pytest
 
-from parso import parse
+from parso import parse, load_grammar, split_lines
 from parso.python import tree
+from parso.tree import iter_descendants
 
 
 class TestsFunctionAndLambdaParsing(object):
@@ -180,3 +182,202 @@ def top_function_three():
 
     r = get_raise_stmts(code, 2) #  Lists inside try-catch
     assert len(list(r)) == 2
+
+
+def test_siblings_and_leaves():
+    module = parse('x = [%s]\n' % ', '.join(str(i) for i in range(100)))
+    leaves = []
+    leaf = module.get_first_leaf()
+    while leaf is not None:
+        leaves.append(leaf)
+        leaf = leaf.get_next_leaf()
+    assert ''.join(l.get_code() for l in leaves) == module.get_code()
+    assert leaves[-1].type == 'endmarker'
+
+    backwards = []
+    leaf = leaves[-1]
+    while leaf is not None:
+        backwards.append(leaf)
+        leaf = leaf.get_previous_leaf()
+    assert backwards == leaves[::-1]
+
+    testlist = leaves[3].parent
+    children = testlist.children
+    assert children[0].get_previous_sibling() is None
+    assert children[-1].get_next_sibling() is None
+    for previous, next_ in zip(children, children[1:]):
+        assert previous.get_next_sibling() is next_
+        assert next_.get_previous_sibling() is previous
+
+
+def test_siblings_after_change():
+    module = parse('a\nb\nc\n')
+    a, b, c, endmarker = module.children
+    assert b.get_next_sibling() is c
+
+    # Changing the children doesn't confuse the remembered indexes.
+    module.children.remove(a)
+    assert b.get_previous_sibling() is None
+    assert c.get_previous_sibling() is b
+    module.children.insert(2, a)
+    assert a.get_previous_sibling() is c
+    assert a.get_next_sibling() is endmarker
+    assert endmarker.get_previous_leaf() is a.children[-1]
+
+    module.children.remove(a)
+    with pytest.raises(ValueError):
+        a.get_next_sibling()
+
+
+def _iter_positions(code):
+    for line_nr, line in enumerate(split_lines(code), 1):
+        for column in range(len(line) + 1):
+            yield line_nr, column
+
+
+@pytest.mark.parametrize('code', [
+    '',
+    'foo(bar, 1)\n# comment\n',
+    'def f(a):\n    """\n    doc\n    """\n    return a +\n\nclass C:\n  x = 3',
+    'if x:\n    1\n  2\n)\n',
+])
+@pytest.mark.parametrize('bodies', ['parse', 'skip'])
+def test_get_leaf_for_position(code, bodies):
+    grammar = load_grammar()
+    expected = grammar.parse(code, bodies=bodies)
+    module = grammar.parse(code, bodies=bodies)
+    for position in _iter_positions(code):
+        for include_prefixes in (False, True):
+            leaf = module.get_leaf_for_position(position, include_prefixes)
+            expected_leaf = tree.BaseNode.get_leaf_for_position(
+                expected, position, include_prefixes)
+            if expected_leaf is None:
+                assert leaf is None
+            else:
+                assert leaf.start_pos == expected_leaf.start_pos
+                assert leaf.get_code() == expected_leaf.get_code()
+
+    with pytest.raises(ValueError):
+        module.get_leaf_for_position((0, 0))
+    with pytest.raises(ValueError):
+        module.get_leaf_for_position((len(split_lines(code)) + 1, 0))
+
+
+def test_get_leaf_for_position_after_diff_parse():
+    grammar = load_grammar()
+    module = grammar.parse('a = 1\nb = 2\n', path='/x.py', diff_cache=True)
+    assert module.get_leaf_for_position((2, 1)).value == 'b'
+
+    new_module = grammar.parse('a = 1\n\nb = 2\n', path='/x.py', diff_cache=True)
+    assert new_module is module
+    assert module.get_leaf_for_position((2, 0)).type == 'newline'
+    assert module.get_leaf_for_position((3, 1)).value == 'b'
+
+
+def _iter_nodes_recursive(node, node_types):
+    for child in node.children:
+        if child.type in node_types:
+            yield child
+        if hasattr(child, 'children'):
+            for n in _iter_nodes_recursive(child, node_types):
+                yield n
+
+
+@pytest.mark.parametrize('node_types', [
+    ['funcdef'],
+    ['import_name', 'import_from'],
+    ['atom_expr', 'trailer', 'name'],
+    ['decorated', 'funcdef', 'classdef'],
+    ['not_existing'],
+])
+def test_iter_nodes(node_types):
+    code = dedent('''\
+        import os
+        from a import b
+
+        @deco
+        def f(x):
+            def g():
+                return os.path.join(x.y, b)
+            class C:
+                import sys
+        ''')
+    module = parse(code)
+    expected = list(_iter_nodes_recursive(module, node_types))
+    assert list(module.iter_nodes(*node_types)) == expected
+    # Now the index exists.
+    assert list(module.iter_nodes(*node_types)) == expected
+
+
+def test_iter_nodes_after_diff_parse():
+    grammar = load_grammar()
+    module = grammar.parse('def f():\n    pass\n', path='/x.py', diff_cache=True)
+    assert [f.name.value for f in module.iter_nodes('funcdef')] == ['f']
+    funcdefs = module.iter_nodes('funcdef')
+
+    code = 'def f():\n    def g(): pass\n    pass\n\ndef h(): pass\n'
+    new_module = grammar.parse(code, path='/x.py', diff_cache=True)
+    assert new_module is module
+    assert [f.name.value for f in module.iter_nodes('funcdef')] == ['f', 'g', 'h']
+    assert [f.name.value for f in funcdefs] == ['f']
+
+
+def test_iter_descendants():
+    module = parse('def f(x):\n    return [x]\n')
+    types = [node.type for node in iter_descendants(module)]
+    assert types[:6] == ['funcdef', 'keyword', 'name', 'parameters', 'operator', 'param']
+    assert types[-1] == 'endmarker'
+    assert len(types) == len(set(map(id, iter_descendants(module))))
+
+    types = [node.type for node in iter_descendants(module, descend_types=['funcdef'])]
+    assert types == ['funcdef', 'keyword', 'name', 'parameters', 'operator',
+                     'suite', 'endmarker']
+
+
+def test_deeply_nested():
+    depth = sys.getrecursionlimit() * 2
+    code = 'def f():\n    x = ' + '(' * depth + 'yield' + ')' * depth + '\n'
+    grammar = load_grammar()
+    module = grammar.parse(code)
+    assert module.get_code() == code
+    assert list(module.get_used_names()) == ['f', 'x']
+    assert len(list(module.iter_nodes('atom'))) == depth
+    funcdef, = module.iter_funcdefs()
+    yield_expr, = funcdef.iter_yield_exprs()
+    assert yield_expr.value == 'yield'
+    assert not list(grammar.iter_errors(module))
+
+
+def test_end_pos_cache():
+    module = parse('x = """\nfoo\nbar"""\ny = 1')
+    string = module.children[0].children[0].children[2]
+    assert string.end_pos == (3, 6)
+    assert string.end_pos == (3, 6)
+
+    # The cached end is relative to the start and depends on the value.
+    string.line += 2
+    assert string.end_pos == (5, 6)
+    string.value = '"""a\n"""'
+    assert string.end_pos == (4, 3)
+    string.value = '"a"'
+    assert string.end_pos == (3, 7)
+
+    newline = module.children[0].children[1]
+    assert newline.end_pos == (4, 0)
+    newline.value = ''
+    assert newline.end_pos == newline.start_pos
+
+
+@pytest.mark.skipif(sys.version_info < (3,), reason="Nothing is interned in Python 2")
+def test_keyword_and_operator_values_interned():
+    module = parse('def f(): return a ** b\ndef g(): return c ** d\n')
+    values = {}
+    leaf = module.get_first_leaf()
+    while leaf is not None:
+        if leaf.type in ('keyword', 'operator'):
+            values.setdefault(leaf.value, []).append(leaf.value)
+        leaf = leaf.get_next_leaf()
+
+    assert len(values['def']) == len(values['**']) == 2
+    for same_values in values.values():
+        assert all(value is same_values[0] for value in same_values)
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from parso import load_grammar, ParserSyntaxError
+from parso.python.parser import Parser
+from parso.profiling import ParserProfile, profile_parse, create_profiling_parser
+
+
+def _count_leaves(node):
+    leaf = node.get_first_leaf()
+    count = 0
+    while leaf is not None:
+        if leaf.type != 'error_leaf':
+            count += 1
+        leaf = leaf.get_next_leaf()
+    return count
+
+
+def test_counters():
+    grammar = load_grammar()
+    code = 'def foo(a, b):\n    return a + b\n\nfoo(1, 2)\n'
+    profile = ParserProfile()
+    module = profile_parse(grammar, code, profile)
+    assert module.get_code() == code
+    assert module.get_code() == grammar.parse(code).get_code()
+
+    shifts = sum(c.shifts for c in profile.nonterminals.values())
+    assert shifts == profile.convert_leaf.calls
+    # INDENT and DEDENT are shifted, but removed from the tree afterwards.
+    assert shifts == _count_leaves(module) + 2
+    assert profile.nonterminals['funcdef'].pushes == 1
+    assert profile.nonterminals['arglist'].pops == 1
+    assert profile.error_recoveries == 0
+    assert profile.stack_removal_sizes == {}
+    assert profile.convert_node.calls > 0
+    assert profile.parse_time > 0
+
+
+def test_error_recovery():
+    profile = ParserProfile()
+    module = profile_parse(load_grammar(), 'def x(:\n    1 +\nfoo\n', profile)
+    assert module.children[0].type == 'error_node'
+    assert profile.error_recoveries > 0
+    assert sum(profile.stack_removal_sizes.values()) > 0
+    assert any(c.removals for c in profile.nonterminals.values())
+    for counter in profile.nonterminals.values():
+        assert counter.pushes == counter.pops + counter.removals
+
+    with pytest.raises(ParserSyntaxError):
+        profile_parse(load_grammar(), '1 +\n', ParserProfile(), error_recovery=False)
+
+
+def test_merge_and_report():
+    grammar = load_grammar()
+    profile1 = ParserProfile()
+    profile2 = ParserProfile()
+    profile_parse(grammar, 'a = 1\n', profile1)
+    profile_parse(grammar, 'b = (\n', profile2)
+
+    merged = ParserProfile()
+    merged.merge(profile1)
+    merged.merge(profile2)
+    assert merged.error_recoveries == profile2.error_recoveries
+    assert merged.nonterminals['expr_stmt'].pops == 1
+    assert merged.nonterminals['expr_stmt'].removals == 1
+    assert merged.convert_leaf.calls == \
+        profile1.convert_leaf.calls + profile2.convert_leaf.calls
+
+    report = json.loads(json.dumps(merged.get_report()))
+    assert report['nonterminals']['expr_stmt']['pushes'] == 2
+
+
+def test_no_overhead_when_disabled():
+    # The normal parser class is never changed by profiling.
+    cls = create_profiling_parser(Parser)
+    assert cls is create_profiling_parser(Parser)
+    assert issubclass(cls, Parser)
+    assert 'convert_leaf' not in Parser.__dict__ or \
+        Parser.convert_leaf is not cls.convert_leaf
+    assert load_grammar()._parser is Parser
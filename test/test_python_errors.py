@@ -8,6 +8,7 @@ import pytest
 
 import parso
 from parso._compatibility import is_pypy
+from parso.python.errors import ErrorFinder, ErrorFinderConfig
 from .failing_examples import FAILING_EXAMPLES, indent, build_nested
 
 
@@ -307,3 +308,30 @@ def test_invalid_fstrings(code, message):
     """
     error, = _get_error_list(code, version='3.6')
     assert message in error.message
+
+
+def test_normalizer_with_overwritten_visit():
+    # Normalizers that overwrite visit expect it to be called for every node.
+    visited = []
+
+    class VisitingErrorFinder(ErrorFinder):
+        def visit(self, node):
+            visited.append(node)
+            return super(VisitingErrorFinder, self).visit(node)
+
+    def expected_nodes(node):
+        yield node
+        # The inner parts of error nodes are not visited.
+        if node.type != 'error_node':
+            for child in getattr(node, 'children', []):
+                for n in expected_nodes(child):
+                    yield n
+
+    grammar = parso.load_grammar()
+    module = grammar.parse('x = 1\ndef f(:\n    y = (1 +\n')
+    normalizer = VisitingErrorFinder(grammar, ErrorFinderConfig())
+    normalizer.walk(module)
+    assert visited == list(expected_nodes(module))
+    assert 'error_node' in [node.type for node in visited]
+    assert [i.code for i in normalizer.issues] == \
+        [i.code for i in grammar.iter_errors(module)]
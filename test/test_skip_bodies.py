@@ -0,0 +1,104 @@
+from textwrap import dedent
+
+import pytest
+
+from parso import load_grammar
+from parso.python import tree
+
+
+def _leaves(node):
+    leaf = node.get_first_leaf()
+    while leaf is not None:
+        yield leaf.type, leaf.value, leaf.start_pos, leaf.prefix
+        leaf = leaf.get_next_leaf()
+
+
+CODE = dedent('''\
+    import os
+
+    class Foo(Bar):  # comment
+        """doc"""
+        x = 1
+
+        def method(self, a):
+            if a:
+                return (1,
+        2)
+            # trailing comment
+
+    # outside
+    def one_liner(): return 3
+
+    @decorator
+    def decorated():
+        pass
+    def broken():
+        )
+        pass
+    def no_newline():
+        return 1''')
+
+
+def test_skip_bodies_round_trip(each_version):
+    grammar = load_grammar(version=each_version)
+    module = grammar.parse(CODE, bodies='skip')
+    assert module.get_code() == CODE
+
+    # Nothing has been parsed so far.
+    suites = [f.children[-1] for f in module.iter_funcdefs()]
+    suites.append(next(module.iter_classdefs()).children[-1])
+    assert all(isinstance(s, tree.LazySuite) for s in suites if s.type == 'suite')
+    assert not any(s.is_parsed() for s in suites if s.type == 'suite')
+
+
+def test_skip_bodies_equals_full_parse(each_version):
+    grammar = load_grammar(version=each_version)
+    lazy_module = grammar.parse(CODE, bodies='skip')
+    module = grammar.parse(CODE)
+    assert list(_leaves(lazy_module)) == list(_leaves(module))
+
+
+def test_lazy_suite_positions():
+    module = load_grammar().parse(CODE, bodies='skip')
+    cls, = module.iter_classdefs()
+    suite = cls.children[-1]
+    assert not suite.is_parsed()
+    start_pos, end_pos = suite.start_pos, suite.end_pos
+    code = suite.get_code(include_prefix=False)
+    assert suite.get_code().startswith('  # comment\n')
+    assert code.startswith('\n')
+
+    # Accessing the children parses the suite, nested bodies stay lazy.
+    method, = cls.iter_funcdefs()
+    assert suite.is_parsed()
+    assert method.parent is suite
+    assert isinstance(method.children[-1], tree.LazySuite)
+    assert not method.children[-1].is_parsed()
+
+    assert (start_pos, end_pos) == (suite.start_pos, suite.end_pos)
+    assert code == suite.get_code(include_prefix=False)
+    assert method.name.start_pos == (7, 8)
+    assert method.get_doc_node() is None
+    assert cls.get_doc_node().value == '"""doc"""'
+
+
+def test_lazy_suite_ended_early():
+    # Error recovery ends the suite of the ``if`` at the tab, the rest of the
+    # body must not get lost.
+    code = ('def f(a):\n    while a:\n        if a:\n            lo = 1\n'
+            '\tfoo\n        else:\n            hi = 2\n    return lo\n\n\n'
+            'def g():\n    pass\n')
+    module = load_grammar().parse(code, bodies='skip')
+    assert module.get_code() == code
+    for funcdef in module.iter_funcdefs():
+        funcdef.children[-1].children
+    assert module.get_code() == code
+    assert list(_leaves(module)) == list(_leaves(load_grammar().parse(code)))
+
+
+def test_skip_bodies_invalid_options():
+    grammar = load_grammar()
+    with pytest.raises(ValueError):
+        grammar.parse('def x(): pass', bodies='foo')
+    with pytest.raises(NotImplementedError):
+        grammar.parse('def x(): pass', bodies='skip', diff_cache=True)